@@ -1,16 +1,19 @@
+import os
+import json
 import samurai
+import bitmask
 import math
-import csv
-import time
 import random
+import argparse
 from collections import Counter
-from ortools.sat.python import cp_model
 import sys
-import threading
 
 # Import the required components from samurai
-from samurai import cross, digits, rows, cols, square_a, square_b, square_c, square_d, square_mid, all_squares, \
-    all_unitlists, grid_values
+from samurai import cross, digits, rows, cols
+from bitmask import ALL, popcount, mask_digits
+from config import DEFAULT
+from topology import SAMURAI
+from analytics import ClueStats, outcome_of, SOLVED, UNSOLVABLE, TIMEOUT
 
 # Define squares for standard sudoku (used in puzzle generation)
 squares = cross(rows, cols)
@@ -19,6 +22,7 @@ unitlist = ([cross(rows, c) for c in cols] +
             [cross(rs, cs) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')])
 units = dict((s, [u for u in unitlist if s in u]) for s in squares)
 peers = dict((s, set(sum(units[s], [])) - set([s])) for s in squares)
+tables = bitmask.build_tables(squares, unitlist)
 
 overlapping_squares = ['A1', 'A2', 'A3', 'A7', 'A8', 'A9',
                        'B1', 'B2', 'B3', 'B7', 'B8', 'B9',
@@ -43,36 +47,43 @@ def index_to_square(index):
     return index_squares_map[index]
 
 
-def assign(values, s, d):
-    """Eliminate all the other values (except d) from values[s]."""
-    other_values = values[s].replace(d, '')
-    if all(eliminate(values, s, d2) for d2 in other_values):
-        return values
-    else:
-        return False
+def to_masks(values, tables):
+    """Convert a {square: digits} dict into a list of candidate bitmasks."""
+    return [bitmask.mask_of(values[s]) for s in tables.squares]
 
 
-def eliminate(values, s, d):
-    """Eliminate d from values[s]; propagate when values or places <= 2."""
-    if d not in values[s]:
-        return values
-    values[s] = values[s].replace(d, '')
-    if len(values[s]) == 0:
+def propagate(values, i, bits, tables):
+    """Eliminate bits from cell i of a {square: digits} dict; update it in place.
+
+    The dict is read into one mask list per call, since that is the form the
+    callers keep; only the squares the propagation changed, as recorded on
+    its trail, are written back. Code that owns its state should keep a mask
+    list and call bitmask.assign / bitmask.eliminate directly, as the
+    puzzle generators here do.
+    """
+    trail = []
+    cands = bitmask.eliminate_all(to_masks(values, tables), tables, [(i, bits)], trail)
+    if not cands:
         return False
-    elif len(values[s]) == 1:
-        d2 = values[s]
-        if not all(eliminate(values, s2, d2) for s2 in peers[s]):
-            return False
-    for u in units[s]:
-        dplaces = [s for s in u if d in values[s]]
-        if len(dplaces) == 0:
-            return False
-        elif len(dplaces) == 1:
-            if not assign(values, dplaces[0], d):
-                return False
+    names = tables.squares
+    for j, _ in trail:
+        values[names[j]] = mask_digits[cands[j]]
     return values
 
 
+def assign(values, s, d, tables=tables):
+    """Eliminate all the other values (except d) from values[s].
+
+    Pass samurai.tables to work on a samurai {square: digits} dict.
+    """
+    return propagate(values, tables.index[s], ALL & ~bitmask.mask_of(d), tables)
+
+
+def eliminate(values, s, d, tables=tables):
+    """Eliminate d from values[s]; propagate naked and hidden singles."""
+    return propagate(values, tables.index[s], bitmask.mask_of(d), tables)
+
+
 def shuffled(seq):
     """Return a randomly shuffled copy of the input sequence."""
     seq = list(seq)
@@ -80,47 +91,61 @@ def shuffled(seq):
     return seq
 
 
+def solved_string(cands):
+    """Render solved cells of a candidate list as digits and the rest as '.'."""
+    return ''.join(mask_digits[m] if popcount[m] == 1 else '.' for m in cands)
+
+
 def random_puzzle(N=17):
-    values = dict((s, digits) for s in squares)
-    for s in shuffled(squares):
-        if not assign(values, s, random.choice(values[s])):
-            break
-        ds = [values[s] for s in squares if len(values[s]) == 1]
-        if len(ds) >= N and len(set(ds)) >= 8:
-            return ''.join(values[s] if len(values[s]) == 1 else '.' for s in squares)
-    return random_puzzle(N)
+    while True:
+        cands = [ALL] * 81
+        for s in shuffled(squares):
+            i = tables.index[s]
+            if not bitmask.assign(cands, i, int(random.choice(mask_digits[cands[i]])), tables):
+                break
+            ds = [m for m in cands if popcount[m] == 1]
+            if len(ds) >= N and len(set(ds)) >= 8:
+                return solved_string(cands)
 
 
 def random_middle_puzzle(N=17, grid='.' * 81):
-    values = dict((s, digits) for s in squares)
-    for s in overlapping_squares:
-        if grid[grid_index(s)] != '.':
-            assign(values, s, grid[grid_index(s)])
-    for s in shuffled(list(set(squares) - set(overlapping_squares))):
-        if not assign(values, s, random.choice(values[s])):
-            break
-        ds = [values[s] for s in squares if len(values[s]) == 1]
-        if len(ds) >= N and len(set(ds)) >= 8:
-            return ''.join(values[s] if len(values[s]) == 1 else '.' for s in squares)
-    return random_middle_puzzle(N, grid)
+    while True:
+        cands = [ALL] * 81
+        for s in overlapping_squares:
+            if grid[grid_index(s)] != '.':
+                bitmask.assign(cands, grid_index(s), int(grid[grid_index(s)]), tables)
+        for s in shuffled([s for s in squares if s not in overlapping_squares]):
+            i = tables.index[s]
+            if not bitmask.assign(cands, i, int(random.choice(mask_digits[cands[i]])), tables):
+                break
+            ds = [m for m in cands if popcount[m] == 1]
+            if len(ds) >= N and len(set(ds)) >= 8:
+                return solved_string(cands)
 
 
 def random_samurai_puzzle(N_a=17, N_b=17, N_c=17, N_d=17, N_plus=17):
-    grid_a = random_puzzle(N_a)
-    grid_b = random_puzzle(N_b)
-    grid_c = random_puzzle(N_c)
-    grid_d = random_puzzle(N_d)
-
-    grid_plus = (grid_a[grid_index('G7'):grid_index('G9') + 1] + '...' + grid_b[grid_index('G1'):grid_index('G3') + 1] +
-                 grid_a[grid_index('H7'):grid_index('H9') + 1] + '...' + grid_b[grid_index('H1'):grid_index('H3') + 1] +
-                 grid_a[grid_index('I7'):grid_index('I9') + 1] + '...' + grid_b[grid_index('I1'):grid_index('I3') + 1] +
-                 '.' * 9 * 3 +
-                 grid_c[grid_index('A7'):grid_index('A9') + 1] + '...' + grid_d[grid_index('A1'):grid_index('A3') + 1] +
-                 grid_c[grid_index('B7'):grid_index('B9') + 1] + '...' + grid_d[grid_index('B1'):grid_index('B3') + 1] +
-                 grid_c[grid_index('C7'):grid_index('C9') + 1] + '...' + grid_d[grid_index('C1'):grid_index('C3') + 1])
-
-    if not check_middle_puzzle(grid_plus):
-        return random_samurai_puzzle(N_a, N_b, N_c, N_d, N_plus)
+    while True:
+        grid_a = random_puzzle(N_a)
+        grid_b = random_puzzle(N_b)
+        grid_c = random_puzzle(N_c)
+        grid_d = random_puzzle(N_d)
+
+        grid_plus = (grid_a[grid_index('G7'):grid_index('G9') + 1] + '...' +
+                     grid_b[grid_index('G1'):grid_index('G3') + 1] +
+                     grid_a[grid_index('H7'):grid_index('H9') + 1] + '...' +
+                     grid_b[grid_index('H1'):grid_index('H3') + 1] +
+                     grid_a[grid_index('I7'):grid_index('I9') + 1] + '...' +
+                     grid_b[grid_index('I1'):grid_index('I3') + 1] +
+                     '.' * 9 * 3 +
+                     grid_c[grid_index('A7'):grid_index('A9') + 1] + '...' +
+                     grid_d[grid_index('A1'):grid_index('A3') + 1] +
+                     grid_c[grid_index('B7'):grid_index('B9') + 1] + '...' +
+                     grid_d[grid_index('B1'):grid_index('B3') + 1] +
+                     grid_c[grid_index('C7'):grid_index('C9') + 1] + '...' +
+                     grid_d[grid_index('C1'):grid_index('C3') + 1])
+
+        if check_middle_puzzle(grid_plus):
+            break
     grid_plus = random_middle_puzzle(N_plus, grid_plus)
 
     samurai_grid = [
@@ -194,122 +219,233 @@ def random_samurai_puzzle(N_a=17, N_b=17, N_c=17, N_d=17, N_plus=17):
                                                                                   grid_index('I1'):grid_index('I9') + 1]
     ]
 
+    # (row, col) of every clue in each grid, keyed by grid label
+    clues = samurai.clue_vector(samurai_grid)
     counts = {}
-    counts['a'] = Counter()
-    counts['b'] = Counter()
-    counts['c'] = Counter()
-    counts['d'] = Counter()
-    counts['+'] = Counter()
+    for label, cells in zip(SAMURAI.labels, SAMURAI.grids):
+        counts[label] = Counter((rows[n // 9], cols[n % 9]) for n, i in enumerate(cells) if clues[i])
 
     return samurai_grid, counts
 
 
 def check_middle_puzzle(grid='.' * 81):
-    values = dict((s, digits) for s in squares)
-    for s in squares:
-        if grid[grid_index(s)] != '.':
-            if not assign(values, s, grid[grid_index(s)]):
-                return False
-    return True
+    clues = [int(c) if c in digits else 0 for c in grid]
+    return bitmask.initial_candidates(clues, tables) is not False
 
 
-def write_counter_to_database(name, counter):
-    with open(name, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Y-Axis', 'X-Axis', 'Number of Hits'])
-        for key, value in counter.items():
-            writer.writerow([key[0], key[1], value])
+# Defined in samurai.py; kept here for callers that catch analyse.TimeoutException
+TimeoutException = samurai.TimeoutException
 
 
-class TimeoutException(Exception):
-    pass
+def solve_with_timeout(samurai_grid, timeout=10, config=DEFAULT):
+    """Solve with the time limit enforced inside the solver.
 
+    Return the solution, or False if the puzzle is unsolvable. Raise
+    samurai.TimeoutException when the limit expires; the search is stopped then
+    rather than left running in the background. config is a
+    config.SolverConfig.
+    """
+    return samurai.solve(samurai_grid, timeout=timeout, config=config)
+
+
+outcome_text = {SOLVED: 'Solved successfully', UNSOLVABLE: 'Unsolvable', TIMEOUT: 'Timeout'}
 
-def solve_with_timeout(samurai_grid, timeout=10):
-    """Solve with timeout using threading."""
-    result = [None]
 
-    def worker():
-        try:
-            # Solve using OR-Tools
-            model = cp_model.CpModel()
-            cells = {}
-            for s in all_squares:
-                cells[s] = model.NewIntVar(1, 9, s)
-
-            for unit in all_unitlists:
-                model.AddAllDifferent([cells[s] for s in unit])
-
-            grid_vals = grid_values(samurai_grid)
-            for s, val in grid_vals.items():
-                if val in digits:
-                    model.Add(cells[s] == int(val))
-
-            solver = cp_model.CpSolver()
-            status = solver.Solve(model)
-
-            if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
-                solution = {}
-                for s in all_squares:
-                    solution[s] = str(solver.Value(cells[s]))
-                result[0] = solution
-            else:
-                result[0] = False
-        except Exception as e:
-            result[0] = False
-
-    thread = threading.Thread(target=worker)
-    thread.start()
-    thread.join(timeout=timeout)
-
-    if thread.is_alive():
-        return False  # Timed out
-    return result[0]
-
-
-if __name__ == '__main__':
-    success_counter = 0
-    timeout_counter = 0
-    num_loops = 100
-
-    a = Counter()
-    b = Counter()
-    c = Counter()
-    d = Counter()
-    plus = Counter()
-
-    for i in range(num_loops):
-        try:
-            samurai_grid, counts = random_samurai_puzzle(17, 17, 17, 17, 17)
-            ans = solve_with_timeout(samurai_grid, timeout=10)
-
-            if ans is False:
-                print(f"Puzzle {i}: Timeout or unsolvable")
-                timeout_counter += 1
-            else:
-                success_counter += 1
-                a.update(counts['a'])
-                b.update(counts['b'])
-                c.update(counts['c'])
-                d.update(counts['d'])
-                plus.update(counts['+'])
-                print(f"Puzzle {i}: Solved successfully")
-        except Exception as e:
-            print(f"Puzzle {i}: Error - {str(e)}")
-            timeout_counter += 1
-
-    write_counter_to_database('grid_a_success_hits.csv', a)
-    write_counter_to_database('grid_b_success_hits.csv', b)
-    write_counter_to_database('grid_c_success_hits.csv', c)
-    write_counter_to_database('grid_d_success_hits.csv', d)
-    write_counter_to_database('grid_plus_success_hits.csv', plus)
+def random_puzzles(count, clues=(17, 17, 17, 17, 17)):
+    """Yield count random samurai grids with the given clues per grid."""
+    for _ in range(count):
+        yield random_samurai_puzzle(*clues)[0]
 
+
+def analyse(count, clues=(17, 17, 17, 17, 17), timeout=10, workers=None, engine='cpsat', verbose=True):
+    """Generate and solve count random puzzles; return their analytics.ClueStats.
+
+    Puzzles are solved on a process pool by samurai.solve_many and added to
+    the per-cell arrays as results arrive, so memory does not grow with count.
+    """
+    stats = ClueStats()
+    pending = {}
+
+    def puzzles():
+        for index, grid in enumerate(random_puzzles(count, clues)):
+            pending[index] = samurai.clue_vector(grid)
+            yield grid
+
+    for result in samurai.solve_many(puzzles(), workers, engine=engine, timeout=timeout):
+        stats.add_results([result], pending)
+        if verbose:
+            print("Puzzle %d: %s" % (result[0], outcome_text[outcome_of(result[1])]))
+    return stats
+
+
+################ Sharded runs ################
+
+# Clues per grid (top left, top right, bottom left, bottom right, middle) of the eval/ scenarios
+SCENARIOS = {
+    'equal_17': (17, 17, 17, 17, 17),
+    'equal_30': (30, 30, 30, 30, 30),
+    'less_mid_17_10': (17, 17, 17, 17, 10),
+    'less_mid_30_10': (30, 30, 30, 30, 10),
+    'less_outside_10_17': (10, 10, 10, 10, 17),
+    'less_outside_10_30': (10, 10, 10, 10, 30),
+}
+
+MANIFEST = 'run.json'
+SHARD = 'shard_%05d.npz'
+
+
+def shard_path(directory, shard):
+    return os.path.join(directory, SHARD % shard)
+
+
+def shard_seed(seed, shard):
+    """Return the random seed of one shard of a run."""
+    return '%d/%d' % (seed, shard)
+
+
+def open_run(directory, settings):
+    """Create a run directory and its manifest, or check settings against the one there.
+
+    Raise ValueError if the directory holds a run with other settings.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        if saved != settings:
+            conflicts = ', '.join('%s=%s (not %s)' % (key, saved.get(key), settings.get(key))
+                                  for key in sorted(set(saved) | set(settings))
+                                  if saved.get(key) != settings.get(key))
+            raise ValueError("%s holds a run with other settings: %s" % (directory, conflicts))
+        return
+    with open(path + '.tmp', 'w') as f:
+        json.dump(settings, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def run(directory, shards, per_shard, clues=SCENARIOS['equal_17'], seed=0, host=(0, 1),
+        timeout=10, workers=None, engine='cpsat'):
+    """Analyse this host's shards of a run, skipping those already on disk; return the shards run.
+
+    Shard s is per_shard puzzles generated from its own seed, so it comes out
+    the same on any host and after any restart. host is (i, n): this host
+    takes the shards with s % n == i. Each finished shard is saved atomically
+    as shard_NNNNN.npz, so an interrupted run only loses the shard in
+    progress and rerunning the same command finishes the rest.
+    """
+    open_run(directory, {'shards': shards, 'per_shard': per_shard, 'clues': list(clues),
+                         'seed': seed, 'timeout': timeout, 'engine': engine})
+    index, hosts = host
+    done = []
+    for shard in range(index, shards, hosts):
+        path = shard_path(directory, shard)
+        if os.path.exists(path):
+            continue
+        random.seed(shard_seed(seed, shard))
+        stats = analyse(per_shard, clues, timeout, workers, engine, verbose=False)
+        stats.save(path)
+        print("Shard %d: %r" % (shard, stats))
+        done.append(shard)
+    return done
+
+
+def merge(directories):
+    """Add up the shards of a run spread over directories; return (ClueStats, missing shards).
+
+    The directories may come from several hosts; a shard found in more than
+    one is counted once. Raise ValueError if they belong to different runs.
+    """
+    settings = None
+    paths = {}
+    for directory in directories:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            saved = json.load(f)
+        if settings is None:
+            settings = saved
+        elif saved != settings:
+            raise ValueError("%s holds a different run" % directory)
+        for name in sorted(os.listdir(directory)):
+            if name.startswith('shard_') and name.endswith('.npz'):
+                paths.setdefault(name, os.path.join(directory, name))
+    stats = ClueStats()
+    for name in sorted(paths):
+        stats.merge(ClueStats.load(paths[name]))
+    missing = [shard for shard in range(settings['shards']) if SHARD % shard not in paths]
+    return stats, missing
+
+
+def report(stats, clues):
+    success_counter, failure_counter, timeout_counter = (int(n) for n in stats.puzzles)
+    num_loops = stats.count
     print('#' * 100)
     print("Number of Initial Squares Filled in each Grid Quadrant:")
-    print("Top Left: 17, Top Right: 17, Bottom Left: 17, Bottom Right: 17, Centre: 17")
+    print("Top Left: %d, Top Right: %d, Bottom Left: %d, Bottom Right: %d, Centre: %d" % tuple(clues))
     print("Successes:", success_counter)
     print("Failures:", num_loops - success_counter)
-    print("Success Ratio:", success_counter / num_loops)
+    print("Success Ratio:", success_counter / num_loops if num_loops else 0.0)
     print("Timeouts:", timeout_counter)
-    print("Timeout Ratio:", timeout_counter / num_loops)
-    print('#' * 100)
\ No newline at end of file
+    print("Timeout Ratio:", timeout_counter / num_loops if num_loops else 0.0)
+
+
+def host_split(text):
+    """Parse 'i/n' as (i, n)."""
+    index, hosts = (int(n) for n in text.split('/'))
+    if not 0 <= index < hosts:
+        raise argparse.ArgumentTypeError("expected i/n with 0 <= i < n")
+    return index, hosts
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Sharded, resumable puzzle analysis.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    start = commands.add_parser('run', help='analyse the missing shards of a run')
+    start.add_argument('directory')
+    start.add_argument('--shards', type=int, default=100)
+    start.add_argument('--per-shard', type=int, default=1000, help='puzzles per shard')
+    start.add_argument('--scenario', default='equal_17', choices=sorted(SCENARIOS))
+    start.add_argument('--seed', type=int, default=0)
+    start.add_argument('--host', type=host_split, default=(0, 1), help='i/n: take every n-th shard from i')
+    start.add_argument('--timeout', type=float, default=10)
+    start.add_argument('--workers', type=int)
+    start.add_argument('--engine', default='cpsat', choices=['cpsat', 'bitmask', 'dlx', 'decompose'])
+    combine = commands.add_parser('merge', help='combine the shards of run directories')
+    combine.add_argument('output')
+    combine.add_argument('directories', nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        try:
+            run(args.directory, args.shards, args.per_shard, SCENARIOS[args.scenario], args.seed, args.host,
+                args.timeout, args.workers, args.engine)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        try:
+            stats, missing = merge(args.directories)
+        except ValueError as e:
+            parser.error(str(e))
+        stats.save(args.output)
+        with open(os.path.join(args.directories[0], MANIFEST)) as f:
+            report(stats, json.load(f)['clues'])
+        if missing:
+            print("Missing shards:", ' '.join(map(str, missing)))
+        print("Clue statistics written to", args.output)
+        print('#' * 100)
+
+
+if __name__ == '__main__':
+    # python analyse.py [COUNT] [OUTPUT]: one run, held in memory
+    # python analyse.py run DIRECTORY [...]: sharded and resumable; see main()
+    # python analyse.py merge OUTPUT DIRECTORY...
+    if len(sys.argv) > 1 and sys.argv[1] in ('run', 'merge'):
+        main(sys.argv[1:])
+        sys.exit()
+    num_loops = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    output = sys.argv[2] if len(sys.argv) > 2 else 'clue_stats.npz'
+
+    stats = analyse(num_loops)
+    stats.save(output)
+    report(stats, (17, 17, 17, 17, 17))
+    print("Clue statistics written to", output)
+    print('#' * 100)
@@ -0,0 +1,201 @@
+## Clue distribution analytics over batches of samurai puzzles
+##
+## ClueStats keeps, for every cell of each of the five grids, how many
+## puzzles had a clue there, how they ended (solved, unsolvable, timed out)
+## and the total solve time of those puzzles. All of it lives in
+## preallocated (5, 9, 9) arrays in samurai grid order (top left, top right,
+## bottom left, bottom right, middle), so a batch of puzzles is added with a
+## few array operations and nothing grows with the number of puzzles.
+##
+## Totals only ever add up, so partial ClueStats built by separate workers or
+## runs are combined with merge() (or +) in any order, without locking: each
+## worker owns its arrays and the owner of the result adds them up. The
+## arrays are written once, to a single .npz file, and heatmaps are drawn
+## straight from them:
+##
+##     python analytics.py clue_stats.npz [solved|unsolvable|timeout|clues|time|rate] [out.png]
+
+import os
+import sys
+import arrays
+from topology import SAMURAI
+
+# Outcome codes, indexing the first axis of ClueStats.hits
+SOLVED, UNSOLVABLE, TIMEOUT = 0, 1, 2
+OUTCOMES = ('solved', 'unsolvable', 'timeout')
+GRID_NAMES = ('top left', 'top right', 'bottom left', 'bottom right', 'middle')
+
+
+def outcome_of(solution):
+    """Return the outcome code of a samurai.solve_many result."""
+    if solution is None:
+        return TIMEOUT
+    return SOLVED if solution else UNSOLVABLE
+
+
+class ClueStats:
+    """Per-cell clue counts, outcomes and solve times of a batch of puzzles.
+
+    hits[o, k, r, c]  puzzles with outcome o and a clue at row r, col c of grid k
+    time[k, r, c]     total solve seconds of the puzzles with a clue there
+    puzzles[o]        puzzles with outcome o
+    seconds           total solve seconds of all puzzles
+    """
+
+    def __init__(self):
+        np = arrays.load()
+        self.hits = np.zeros((len(OUTCOMES), 5, 9, 9), dtype=np.int64)
+        self.time = np.zeros((5, 9, 9))
+        self.puzzles = np.zeros(len(OUTCOMES), dtype=np.int64)
+        self.seconds = 0.0
+
+    @property
+    def count(self):
+        return int(self.puzzles.sum())
+
+    @property
+    def clues(self):
+        """Puzzles with a clue at each cell, whatever their outcome."""
+        return self.hits.sum(axis=0)
+
+    def rate(self, outcome=SOLVED):
+        """Fraction of the puzzles with a clue at each cell that had outcome."""
+        np = arrays.np
+        clues = self.clues
+        return np.divide(self.hits[outcome], clues, out=np.zeros(clues.shape), where=clues > 0)
+
+    def mean_time(self):
+        """Mean solve time of the puzzles with a clue at each cell."""
+        np = arrays.np
+        clues = self.clues
+        return np.divide(self.time, clues, out=np.zeros(clues.shape), where=clues > 0)
+
+    def add(self, clues, outcome, seconds=0.0):
+        """Add one puzzle, given by its 369 clue digits (0 for empties)."""
+        self.add_many([clues], [outcome], [seconds])
+
+    def add_many(self, clues, outcomes, seconds):
+        """Add a batch: an (N, 369) array of clue digits, N outcome codes and N solve times."""
+        np = arrays.np
+        grid_cells = np.array(SAMURAI.grids)
+        clues = np.asarray(clues, dtype=np.uint8)
+        outcomes = np.asarray(outcomes, dtype=np.intp)
+        seconds = np.asarray(seconds, dtype=float)
+        for start in range(0, len(clues), arrays.CHUNK):
+            part = slice(start, start + arrays.CHUNK)
+            occupied = (clues[part][:, grid_cells] != 0).reshape(-1, 5, 9, 9)
+            for o in range(len(OUTCOMES)):
+                chosen = outcomes[part] == o
+                if chosen.any():
+                    self.hits[o] += occupied[chosen].sum(axis=0)
+            self.time += np.tensordot(seconds[part], occupied, axes=1)
+        self.puzzles += np.bincount(outcomes, minlength=len(OUTCOMES))
+        self.seconds += float(seconds.sum())
+
+    def add_results(self, results, clues):
+        """Add (index, solution, stats) results of samurai.solve_many.
+
+        clues maps each index to the puzzle's clue digits; entries are
+        removed as their results are added, so it only ever holds the
+        puzzles still in flight.
+        """
+        batch, outcomes, seconds = [], [], []
+        for index, solution, summary in results:
+            batch.append(clues.pop(index))
+            outcomes.append(outcome_of(solution))
+            seconds.append(summary['time'])
+        if batch:
+            self.add_many(batch, outcomes, seconds)
+
+    def merge(self, other):
+        """Add the totals of another ClueStats into this one; return self."""
+        self.hits += other.hits
+        self.time += other.time
+        self.puzzles += other.puzzles
+        self.seconds += other.seconds
+        return self
+
+    def __add__(self, other):
+        return ClueStats().merge(self).merge(other)
+
+    def __repr__(self):
+        return 'ClueStats(%s)' % ', '.join('%s=%d' % (name, n) for name, n in zip(OUTCOMES, self.puzzles))
+
+    def save(self, path):
+        """Write the arrays to a compressed .npz file in one go.
+
+        The file is written under a temporary name and renamed into place,
+        so it is never seen half written, even after a crash.
+        """
+        np = arrays.np
+        temp = path + '.tmp'
+        with open(temp, 'wb') as f:
+            np.savez_compressed(f, hits=self.hits, time=self.time, puzzles=self.puzzles,
+                                seconds=np.array(self.seconds))
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a ClueStats written by save()."""
+        stats = cls()
+        with arrays.np.load(path) as data:
+            stats.hits[...] = data['hits']
+            stats.time[...] = data['time']
+            stats.puzzles[...] = data['puzzles']
+            stats.seconds = float(data['seconds'])
+        return stats
+
+    def field(self, name):
+        """Return one (5, 9, 9) array by name: an outcome, 'clues', 'time' or 'rate'."""
+        if name in OUTCOMES:
+            return self.hits[OUTCOMES.index(name)]
+        if name == 'clues':
+            return self.clues
+        if name == 'time':
+            return self.mean_time()
+        if name == 'rate':
+            return self.rate(SOLVED)
+        raise ValueError("Unknown field: %r" % name)
+
+
+def plot(arrays, title='', path=None):
+    """Draw a (5, 9, 9) array as five heatmaps laid out like the samurai.
+
+    Save the figure to path if given, otherwise show it. Needs matplotlib,
+    and uses seaborn when it is installed.
+    """
+    import matplotlib.pyplot as plt
+    try:
+        import seaborn as sns
+    except ImportError:
+        sns = None
+    labels = list('ABCDEFGHI')
+    figure, axes = plt.subplots(3, 3, figsize=(12, 12))
+    for ax in axes.flat:
+        ax.axis('off')
+    high = float(arrays.max()) or 1.0
+    for k, (row, col) in enumerate([(0, 0), (0, 2), (2, 0), (2, 2), (1, 1)]):
+        ax = axes[row, col]
+        ax.axis('on')
+        if sns is not None:
+            sns.heatmap(arrays[k], ax=ax, vmin=0, vmax=high, square=True, cbar=k == 4,
+                        xticklabels=range(1, 10), yticklabels=labels)
+        else:
+            ax.imshow(arrays[k], vmin=0, vmax=high)
+            ax.set_xticks(range(9), range(1, 10))
+            ax.set_yticks(range(9), labels)
+        ax.set_title(GRID_NAMES[k])
+    figure.suptitle(title)
+    if path:
+        figure.savefig(path)
+    else:
+        plt.show()
+    plt.close(figure)
+
+
+if __name__ == '__main__' and len(sys.argv) >= 2:
+    stats = ClueStats.load(sys.argv[1])
+    name = sys.argv[2] if len(sys.argv) > 2 else 'solved'
+    print(stats)
+    plot(stats.field(name), '%s (%d puzzles)' % (name, stats.count),
+         sys.argv[3] if len(sys.argv) > 3 else None)
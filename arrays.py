@@ -0,0 +1,40 @@
+## NumPy, loaded on first use, and the lookup arrays the vectorized code shares
+##
+## batch.py, checker.py and analytics.py work on whole arrays of puzzles, but
+## importing them (as samurai does with the checker) must not import NumPy.
+## Each of their entry points calls load(), which imports NumPy once and
+## builds, from the tables in bitmask.py, the arrays they index with:
+##
+##   popcount[m]    number of candidates in the 9-bit mask m
+##   bit_value[m]   the digit of a single-bit mask m, 0 for any other mask
+##   digit_mask[v]  candidate mask of clue digit v, ALL for 0
+##   digit_bits[v]  bit (1 << v-1) of each byte value v, 0 unless v is a digit 1-9
+
+import bitmask
+
+# Puzzles each of them handles per step. The largest temporaries are those
+# of batch.propagate, about 14 KB per samurai, so a chunk peaks near 60 MB;
+# the checker and analytics need a small fraction of that.
+CHUNK = 4096
+
+np = None
+popcount = None
+bit_value = None
+digit_mask = None
+digit_bits = None
+
+
+def load():
+    """Import numpy and build the lookup arrays, once; return numpy."""
+    global np, popcount, bit_value, digit_mask, digit_bits
+    if np is None:
+        import numpy
+        popcount = numpy.array(bitmask.popcount, dtype=numpy.uint8)
+        bit_value = numpy.zeros(bitmask.ALL + 1, dtype=numpy.uint8)
+        for m, d in bitmask.bit_value.items():
+            bit_value[m] = d
+        digit_mask = numpy.array([bitmask.ALL] + [1 << d for d in range(9)], dtype=numpy.uint16)
+        digit_bits = numpy.zeros(256, dtype=numpy.uint16)
+        digit_bits[1:10] = digit_mask[1:]
+        np = numpy
+    return np
@@ -0,0 +1,185 @@
+## Propagate many puzzles at once with NumPy
+##
+## A batch of N puzzles is an (N, cells) array of uint16 candidate masks, one
+## 9-bit mask per cell as in bitmask.py. One round gathers every unit of
+## every puzzle into an (N, 9, units) array and finds, with a handful of
+## whole-array operations, the digits already placed in each unit (naked
+## singles) and the digits with one place left in it (hidden singles); both
+## are then scattered back to the cells through their units. Rounds repeat
+## until no puzzle changes, dropping puzzles as they settle.
+##
+## Propagation alone settles most generated puzzles. Those it leaves open go
+## to samurai.solve one by one, with every cell it fixed given as a clue, so
+## they need less search there.
+##
+##     python batch.py PUZZLE_FILE [ENGINE]
+
+import sys
+import time
+from itertools import islice
+import arrays
+from bitmask import ALL
+from topology import SAMURAI
+
+# Status of each puzzle after propagate()
+CONTRADICTION, OPEN, SOLVED = -1, 0, 1
+
+
+class Layout:
+    """Index arrays of a topology, shaped for gathers over a whole batch."""
+
+    def __init__(self, topology=SAMURAI):
+        np = arrays.load()
+        self.topology = topology
+        tables = topology.tables
+        # units[p, k] is the cell at position p of unit k, so gathering puts
+        # each position of every unit in one contiguous block
+        self.units = np.ascontiguousarray(np.array(tables.units, dtype=np.intp).T)
+        # Units of each cell, padded with a unit number one past the last,
+        # which gathers from an all-zero column
+        width = max(len(ks) for ks in tables.cell_units)
+        self.cell_units = np.full((len(topology), width), len(tables.units), dtype=np.intp)
+        for i, ks in enumerate(tables.cell_units):
+            self.cell_units[i, :len(ks)] = ks
+
+
+_layouts = {}
+
+
+def get_layout(topology=SAMURAI):
+    """Return the Layout of topology, building it only once."""
+    if topology.name not in _layouts:
+        _layouts[topology.name] = Layout(topology)
+    return _layouts[topology.name]
+
+
+def initial(clues):
+    """Return the (N, cells) candidate masks of an (N, cells) array of clue digits."""
+    np = arrays.load()
+    return arrays.digit_mask[np.asarray(clues, dtype=np.uint8)]
+
+
+def _spread(layout, unit_bits):
+    """OR each unit's bits into every cell of it: (N, units) -> (N, cells)."""
+    np = arrays.np
+    padded = np.concatenate([unit_bits, np.zeros((len(unit_bits), 1), dtype=np.uint16)], axis=1)
+    gathered = padded[:, layout.cell_units]
+    bits = gathered[:, :, 0]
+    for k in range(1, gathered.shape[2]):
+        bits = bits | gathered[:, :, k]
+    return bits
+
+
+def propagate_round(cands, layout):
+    """Apply one round of naked and hidden singles to every puzzle.
+
+    Return the new candidates and a boolean array marking the puzzles
+    found to be contradictory.
+    """
+    np, popcount = arrays.np, arrays.popcount
+    gathered = cands[:, layout.units]
+    solved = np.where(popcount[gathered] == 1, gathered, np.uint16(0))
+    # once: digits seen in at least one cell of the unit, twice: in two or more
+    placed, once = solved[:, 0], gathered[:, 0]
+    placed_twice, twice = np.zeros_like(placed), np.zeros_like(once)
+    for p in range(1, gathered.shape[1]):
+        placed_twice |= placed & solved[:, p]
+        placed = placed | solved[:, p]
+        twice |= once & gathered[:, p]
+        once = once | gathered[:, p]
+    bad = (placed_twice != 0).any(axis=1) | (once != ALL).any(axis=1)
+
+    is_open = popcount[cands] > 1
+    new = np.where(is_open, cands & ~_spread(layout, placed), cands)
+    hidden = new & _spread(layout, once & ~twice)
+    hidden_count = popcount[hidden]
+    new = np.where(is_open & (hidden_count == 1), hidden, new)
+    bad |= (new == 0).any(axis=1) | (is_open & (hidden_count > 1)).any(axis=1)
+    return new, bad
+
+
+def propagate(cands, topology=SAMURAI):
+    """Propagate singles in an (N, cells) uint16 candidate array until nothing changes.
+
+    Modifies cands in place; return an array with the status of each
+    puzzle: SOLVED, OPEN (needs search) or CONTRADICTION.
+    """
+    layout = get_layout(topology)
+    np, popcount = arrays.np, arrays.popcount
+    status = np.full(len(cands), OPEN, dtype=np.int8)
+    active = np.arange(len(cands))
+    while len(active):
+        current = cands[active]
+        new, bad = propagate_round(current, layout)
+        changed = (new != current).any(axis=1)
+        cands[active] = new
+        status[active[bad]] = CONTRADICTION
+        active = active[changed & ~bad]
+    done = status == OPEN
+    status[done & (popcount[cands] == 1).all(axis=1)] = SOLVED
+    return status
+
+
+def solve_clues(clues, engine='bitmask', timeout=None):
+    """Solve an (N, 369) array of samurai clue digits; return a list of digit arrays, False or None.
+
+    Puzzles left open by propagation are finished by samurai.solve with
+    engine; None marks a timeout there.
+    """
+    cands = initial(clues)
+    status = propagate(cands)
+    np, popcount = arrays.np, arrays.popcount
+    digits = arrays.bit_value[cands]
+    results = []
+    for n, state in enumerate(status):
+        if state == SOLVED:
+            results.append(digits[n])
+        elif state == CONTRADICTION:
+            results.append(False)
+        else:
+            results.append(_finish(np.where(popcount[cands[n]] == 1, digits[n], 0), engine, timeout))
+    return results
+
+
+def _finish(clues, engine, timeout):
+    """Solve one puzzle that propagation left open."""
+    import samurai
+    try:
+        solution = samurai.solve(samurai.SamuraiGrid(clues.tobytes()), engine, timeout)
+    except samurai.TimeoutException:
+        return None
+    np = arrays.np
+    return np.frombuffer(solution.cells, dtype=np.uint8) if solution else False
+
+
+def solve_batch(grids, engine='bitmask', timeout=None, chunk=arrays.CHUNK):
+    """Solve samurai grids in chunks, yielding a SamuraiGrid, False or None for each in order.
+
+    grids may be any iterable of the forms samurai.clue_vector accepts and
+    is consumed chunk by chunk. engine and timeout apply to the puzzles
+    propagation cannot settle.
+    """
+    import samurai
+    np = arrays.load()
+    grids = iter(grids)
+    while True:
+        clues = [samurai.clue_vector(grid) for grid in islice(grids, chunk)]
+        if not clues:
+            return
+        for result in solve_clues(np.array(clues, dtype=np.uint8), engine, timeout):
+            if result is None or result is False:
+                yield result
+            else:
+                yield samurai.SamuraiGrid(result.tobytes())
+
+
+if __name__ == '__main__' and len(sys.argv) >= 2:
+    import puzzleio
+    start = time.perf_counter()
+    outcomes = {'solved': 0, 'unsolvable': 0, 'timeout': 0}
+    for solution in solve_batch(puzzleio.read(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else 'bitmask'):
+        outcomes['timeout' if solution is None else 'solved' if solution else 'unsolvable'] += 1
+    elapsed = time.perf_counter() - start
+    total = sum(outcomes.values())
+    print('%d puzzles in %.2f s (%.0f/s): %s' % (total, elapsed, total / elapsed if elapsed else 0,
+                                                  ', '.join('%s %d' % item for item in outcomes.items())))
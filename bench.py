@@ -0,0 +1,254 @@
+## Benchmark the solving engines over tests/ and generated puzzles
+##
+## To run in command line:
+##     python bench.py --output bench.json
+##     python bench.py --baseline bench.json
+##     python bench.py --engines bitmask --scenarios --generate 20
+##
+## Generated puzzles follow the eval/ scenarios, using the same seeded
+## analyse.random_samurai_puzzle generator. Each (scenario, engine) pair
+## reports latency percentiles, throughput over the wall time of the run,
+## the time spent parsing, building the model, presolving and searching, and
+## the engines' search counters (see stats.py). The report's peak_rss_kb is
+## the peak memory of the whole benchmark process, not of any one engine,
+## and is null where the resource module is missing (Windows). --generate
+## also times the seeded puzzle generator and fails if any puzzle is not
+## proven unique or takes over a minute.
+##
+## A baseline is only compared against a run with the same seed, count and
+## timeout.
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import platform
+import argparse
+import samurai
+import analyse
+from samurai import TimeoutException
+
+# The eval/ scenarios: clues per grid (top left, top right, bottom left, bottom right, centre)
+SCENARIOS = analyse.SCENARIOS
+ENGINES = ['cpsat', 'bitmask', 'dlx', 'decompose']
+PHASES = ['parse', 'build', 'presolve', 'search']
+COUNTERS = ['branches', 'conflicts', 'propagations', 'guesses', 'backtracks', 'backtrack_levels']
+
+
+def test_puzzles(directory='tests'):
+    """Return the puzzles in directory as a list of (name, grid)."""
+    puzzles = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.txt'))):
+        with open(path) as f:
+            puzzles.append((os.path.basename(path), [line.strip() for line in f if line.strip()]))
+    return puzzles
+
+
+def scenario_puzzles(clues, count, seed):
+    """Return count seeded puzzles with the given clues per grid."""
+    random.seed(seed)
+    return [('%d' % n, analyse.random_samurai_puzzle(*clues)[0]) for n in range(count)]
+
+
+def percentile(values, q):
+    """Return the q-th percentile of values by linear interpolation."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def time_solve(grid, engine, timeout):
+    """Solve grid once; return its outcome and SolveStats."""
+    try:
+        return samurai.solve(grid, engine, timeout, stats=True)[1]
+    except TimeoutException as e:
+        return e.stats
+
+
+def run_engine(puzzles, engine, timeout):
+    """Solve every puzzle with engine and summarise the timings and search counters."""
+    outcomes = {'solved': 0, 'unsolvable': 0, 'timeout': 0}
+    phases = dict((phase, 0.0) for phase in PHASES)
+    counters = dict((counter, 0) for counter in COUNTERS)
+    totals = []
+    start = time.perf_counter()
+    for name, grid in puzzles:
+        stats = time_solve(grid, engine, timeout)
+        outcomes[stats.outcome] += 1
+        for phase in PHASES:
+            phases[phase] += getattr(stats, phase + '_time')
+        for counter in COUNTERS:
+            counters[counter] += getattr(stats, counter)
+        totals.append(stats.total_time)
+    # wall time around the whole loop, so throughput includes everything
+    # between solves that the per-phase timers do not cover
+    elapsed = time.perf_counter() - start
+    ms = [t * 1000 for t in totals]
+    report = {
+        'puzzles': len(puzzles),
+        'outcomes': outcomes,
+        'p50_ms': percentile(ms, 50),
+        'p95_ms': percentile(ms, 95),
+        'p99_ms': percentile(ms, 99),
+        'mean_ms': sum(ms) / len(ms) if ms else 0.0,
+        'throughput_per_s': len(puzzles) / elapsed if elapsed else 0.0,
+        'counters': counters,
+    }
+    for phase in PHASES:
+        report[phase + '_ms'] = phases[phase] * 1000
+    return report
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process so far, in KB, or None.
+
+    This is a high-water mark over the whole run, not per engine: memory
+    an earlier engine used is still counted when a later one runs. None
+    where the resource module does not exist, as on Windows.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_generator(count=20, seed=1, limit=60.0):
+    """Time generator.generate_many(count, seed=seed) and check each puzzle is unique.
+
+    Return the report and a list of failures: puzzles that are not unique
+    or took more than limit seconds to generate.
+    """
+    import generator
+    failures = []
+    ms = []
+    start = time.perf_counter()
+    for n, puzzle in enumerate(generator.generate_many(count, seed=seed)):
+        ms.append((time.perf_counter() - start) * 1000)
+        if ms[-1] > limit * 1000:
+            failures.append('puzzle %d took %.1f s' % (n, ms[-1] / 1000))
+        try:
+            if samurai.count_solutions(puzzle, 2, timeout=limit) != 1:
+                failures.append('puzzle %d is not unique' % n)
+        except TimeoutException:
+            failures.append('puzzle %d could not be proven unique in %.0f s' % (n, limit))
+        start = time.perf_counter()
+    report = {
+        'puzzles': count,
+        'p50_ms': percentile(ms, 50),
+        'p95_ms': percentile(ms, 95),
+        'max_ms': max(ms) if ms else 0.0,
+        'mean_ms': sum(ms) / len(ms) if ms else 0.0,
+    }
+    return report, failures
+
+
+def run(engines, scenarios, count, seed, timeout):
+    """Run the benchmark; return the report as a dict."""
+    suites = [('tests', test_puzzles())]
+    suites += [(name, scenario_puzzles(SCENARIOS[name], count, seed)) for name in scenarios]
+
+    # Building the CP-SAT template loads OR-Tools, so only do it when it is benchmarked
+    template_ms = None
+    if 'cpsat' in engines:
+        start = time.perf_counter()
+        samurai.get_solver()
+        template_ms = (time.perf_counter() - start) * 1000
+
+    results = {}
+    for suite, puzzles in suites:
+        for engine in engines:
+            key = '%s/%s' % (suite, engine)
+            results[key] = run_engine(puzzles, engine, timeout)
+            r = results[key]
+            print('%-28s p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms  %8.1f/s  %s' %
+                  (key, r['p50_ms'], r['p95_ms'], r['p99_ms'], r['throughput_per_s'],
+                   ' '.join('%s=%d' % kv for kv in sorted(r['outcomes'].items()))))
+    return {
+        'settings': {'engines': engines, 'scenarios': scenarios, 'count': count,
+                     'seed': seed, 'timeout': timeout},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'cpsat_template_build_ms': template_ms,
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Return the regressions of report against baseline as readable lines.
+
+    A regression is a p50 or p95 more than tolerance (a fraction) slower than
+    the baseline; differences under a millisecond are treated as noise.
+    Raise ValueError if the baseline was run with another seed, count,
+    timeout or generator count, since its timings are then not comparable.
+    """
+    # reports from before --generate existed ran no generator
+    old = dict({'generate': 0}, **baseline['settings'])
+    new = dict({'generate': 0}, **report['settings'])
+    conflicts = ['%s=%s (not %s)' % (key, old.get(key), new.get(key))
+                 for key in ('seed', 'count', 'timeout', 'generate') if old.get(key) != new.get(key)]
+    if conflicts:
+        raise ValueError("Baseline was recorded with other settings: %s" % ', '.join(conflicts))
+    regressions = []
+    for key, base in sorted(baseline['results'].items()):
+        if key not in report['results']:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            old, new = base[metric], report['results'][key][metric]
+            if new > old * (1 + tolerance) and new - old > 1.0:
+                regressions.append('%s %s: %.2f ms -> %.2f ms' % (key, metric, old, new))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the samurai solving engines.')
+    parser.add_argument('--engines', nargs='+', default=ENGINES, choices=ENGINES)
+    parser.add_argument('--scenarios', nargs='*', default=sorted(SCENARIOS), choices=sorted(SCENARIOS))
+    parser.add_argument('--count', type=int, default=20, help='generated puzzles per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=5.0, help='seconds per solve')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--generate', type=int, default=0, metavar='COUNT',
+                        help='also time generating COUNT unique puzzles from --generate-seed')
+    parser.add_argument('--generate-seed', type=int, default=1)
+    args = parser.parse_args()
+
+    report = run(args.engines, args.scenarios, args.count, args.seed, args.timeout)
+    report['settings']['generate'] = args.generate
+    failures = []
+    if args.generate:
+        key = 'generator/seed_%d' % args.generate_seed
+        report['results'][key], failures = run_generator(args.generate, args.generate_seed)
+        r = report['results'][key]
+        print('%-28s p50 %8.2f ms  p95 %8.2f ms  max %8.2f ms' % (key, r['p50_ms'], r['p95_ms'], r['max_ms']))
+        for line in failures:
+            print('FAILURE', line)
+    report['peak_rss_kb'] = peak_rss_kb()
+    if report['peak_rss_kb'] is not None:
+        print('Peak RSS %d KB' % report['peak_rss_kb'])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare(report, baseline, args.tolerance)
+        except ValueError as e:
+            parser.error(str(e))
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against', args.baseline)
+    if failures:
+        sys.exit(1)
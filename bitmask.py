@@ -0,0 +1,304 @@
+## Bitmask candidate engine for sudoku-like puzzles
+##
+## Candidates for a cell are a 9-bit int (bit d-1 set when digit d is still
+## possible), held in a flat list indexed by cell. The engine only needs the
+## unit lists, so the same code runs on a 9x9 sudoku and on the samurai grid.
+
+import time
+from collections import namedtuple
+
+digits = '123456789'
+ALL = 0x1FF
+
+# Lookup tables over every possible 9-bit mask
+popcount = [bin(m).count('1') for m in range(ALL + 1)]
+mask_digits = [''.join(d for i, d in enumerate(digits) if m >> i & 1) for m in range(ALL + 1)]
+mask_bits = [[1 << i for i in range(9) if m >> i & 1] for m in range(ALL + 1)]
+bit_value = dict((1 << i, i + 1) for i in range(9))
+
+
+def mask_of(chars):
+    """Return the bitmask of a string of digits such as '1357'."""
+    m = 0
+    for d in chars:
+        m |= 1 << (int(d) - 1)
+    return m
+
+
+Tables = namedtuple('Tables', 'squares index units cell_units peers intersections')
+
+
+def build_tables(squares, unitlist):
+    """Compile named squares and units into integer index tables.
+
+    intersections lists (rest, inside, outside) for every pair of units
+    sharing two or more cells, such as a box and a row: inside is the shared
+    cells, rest the other cells of the first unit and outside the other cells
+    of the second.
+    """
+    index = dict((s, i) for i, s in enumerate(squares))
+    units = [tuple(index[s] for s in u) for u in unitlist]
+    cell_units = [[] for _ in squares]
+    for k, u in enumerate(units):
+        for i in u:
+            cell_units[i].append(k)
+    peers = [tuple(sorted(set(j for k in cell_units[i] for j in units[k]) - set([i])))
+             for i in range(len(squares))]
+    intersections = []
+    for k, u in enumerate(units):
+        shared = {}
+        for i in u:
+            for j in cell_units[i]:
+                if j != k:
+                    shared.setdefault(j, []).append(i)
+        for j, inside in shared.items():
+            if len(inside) > 1:
+                intersections.append((tuple(i for i in u if i not in inside), tuple(inside),
+                                      tuple(i for i in units[j] if i not in inside)))
+    return Tables(list(squares), index, units, [tuple(ks) for ks in cell_units], peers, intersections)
+
+
+################ Propagation ################
+
+def eliminate_all(cands, tables, pending, trail=None):
+    """Eliminate (cell, bits) pairs from cands until no single is left to propagate.
+
+    Naked singles remove their digit from all peers and hidden singles assign
+    the only cell left for a digit in a unit. Works from an explicit worklist,
+    so long chains never recurse. Return False on a contradiction.
+
+    If a trail list is given, (cell, old mask) is appended before every change
+    so that undo() can restore cands, even after a contradiction.
+    """
+    units, cell_units, peers = tables.units, tables.cell_units, tables.peers
+    while pending:
+        i, bits = pending.pop()
+        old = cands[i]
+        removed = old & bits
+        if not removed:
+            continue
+        m = old & ~bits
+        if not m:
+            return False
+        if trail is not None:
+            trail.append((i, old))
+        cands[i] = m
+        if popcount[m] == 1:
+            for j in peers[i]:
+                if cands[j] & m:
+                    pending.append((j, m))
+        for k in cell_units[i]:
+            for b in mask_bits[removed]:
+                place = -1
+                for j in units[k]:
+                    if cands[j] & b:
+                        if place >= 0:
+                            break
+                        place = j
+                else:
+                    if place < 0:
+                        return False
+                    if cands[place] != b:
+                        pending.append((place, cands[place] & ~b))
+    return cands
+
+
+def assign(cands, i, d, tables, trail=None):
+    """Eliminate all digits except d from cell i and propagate."""
+    return eliminate_all(cands, tables, [(i, cands[i] & ~(1 << (d - 1)))], trail)
+
+
+def undo(cands, trail, mark):
+    """Restore cands to the state when the trail had mark entries."""
+    while len(trail) > mark:
+        i, old = trail.pop()
+        cands[i] = old
+
+
+def eliminate(cands, i, d, tables):
+    """Eliminate digit d from cell i and propagate."""
+    return eliminate_all(cands, tables, [(i, 1 << (d - 1))])
+
+
+def initial_candidates(clues, tables):
+    """Return propagated candidates for a list of clue digits (0 for empty).
+
+    Peers of the clues are cleared unit by unit in one sweep, and only the
+    singles that sweep exposes go through the worklist.
+    """
+    units, cell_units, peers = tables.units, tables.cell_units, tables.peers
+    used = []
+    for u in units:
+        seen = 0
+        for i in u:
+            if clues[i]:
+                b = 1 << (clues[i] - 1)
+                if seen & b:
+                    return False
+                seen |= b
+        used.append(seen)
+
+    cands = [0] * len(clues)
+    pending = []
+    for i, d in enumerate(clues):
+        if d:
+            cands[i] = 1 << (d - 1)
+            continue
+        m = ALL
+        for k in cell_units[i]:
+            m &= ~used[k]
+        if not m:
+            return False
+        cands[i] = m
+    for i, m in enumerate(cands):
+        if popcount[m] == 1 and not clues[i]:
+            pending.extend((j, m) for j in peers[i] if cands[j] & m)
+
+    for u in units:
+        once = twice = 0
+        for i in u:
+            twice |= once & cands[i]
+            once |= cands[i]
+        if once != ALL:
+            return False
+        for b in mask_bits[once & ~twice]:
+            for i in u:
+                if cands[i] & b:
+                    if cands[i] != b:
+                        pending.append((i, cands[i] & ~b))
+                    break
+    return eliminate_all(cands, tables, pending)
+
+
+def find_locked(cands, tables):
+    """Find locked candidates (pointing and claiming) in cands.
+
+    A digit whose places in a unit all lie where it crosses another unit
+    cannot go anywhere else in that other unit. Return the number of such
+    crossings that rule something out and the (cell, bits) eliminations,
+    ready for eliminate_all.
+    """
+    found = 0
+    pending = []
+    for rest, inside, outside in tables.intersections:
+        inner = outer = 0
+        for i in inside:
+            inner |= cands[i]
+        for i in rest:
+            outer |= cands[i]
+        locked = inner & ~outer
+        if locked:
+            count = len(pending)
+            for i in outside:
+                if cands[i] & locked:
+                    pending.append((i, locked))
+            found += len(pending) > count
+    return found, pending
+
+
+def eliminate_locked(cands, tables):
+    """Apply locked candidates until none is left, propagating singles after every round.
+
+    Modifies cands in place; return it, or False on a contradiction.
+    """
+    while True:
+        found, pending = find_locked(cands, tables)
+        if not pending:
+            return cands
+        if not eliminate_all(cands, tables, pending):
+            return False
+
+
+def presolve(clues, tables):
+    """Return candidates for clue digits after singles and locked candidates, or False."""
+    cands = initial_candidates(clues, tables)
+    if not cands:
+        return cands
+    return eliminate_locked(cands, tables)
+
+
+################ Search ################
+
+def choose_cell(cands):
+    """Return the unsolved cell with the fewest candidates, or -1 if all are solved."""
+    best, best_count = -1, 10
+    for i, m in enumerate(cands):
+        n = popcount[m]
+        if 1 < n < best_count:
+            best, best_count = i, n
+            if n == 2:
+                break
+    return best
+
+
+def search(cands, tables, deadline=None, stats=None):
+    """Depth-first search with minimum-remaining-values branching.
+
+    deadline is a time.monotonic() value; return None if it passes first.
+    stats, if given, is a stats.SolveStats that counts guesses and backtracks.
+    """
+    if cands is False:
+        if stats is not None:
+            stats.fail()
+        return False
+    if deadline is not None and time.monotonic() > deadline:
+        return None
+    best = choose_cell(cands)
+    if best < 0:
+        return cands
+    m = cands[best]
+    if stats is not None:
+        stats.descend()
+    for b in mask_bits[m]:
+        if stats is not None:
+            stats.guess()
+        result = search(eliminate_all(cands[:], tables, [(best, m & ~b)]), tables, deadline, stats)
+        if result or result is None:
+            return result
+    if stats is not None:
+        stats.ascend()
+    return False
+
+
+def count_solutions(cands, tables, limit=2, deadline=None):
+    """Count solutions reachable from cands, stopping once limit are found.
+
+    Return None if deadline passes before the count is settled.
+    """
+    if cands is False:
+        return 0
+    if deadline is not None and time.monotonic() > deadline:
+        return None
+    best = choose_cell(cands)
+    if best < 0:
+        return 1
+    m = cands[best]
+    count = 0
+    for b in mask_bits[m]:
+        found = count_solutions(eliminate_all(cands[:], tables, [(best, m & ~b)]),
+                                tables, limit - count, deadline)
+        if found is None:
+            return None
+        count += found
+        if count >= limit:
+            break
+    return count
+
+
+def solve(clues, tables, deadline=None, stats=None):
+    """Solve a list of clue digits; return the solution digits, False, or None on timeout.
+
+    stats, if given, also gets the presolve (initial propagation) and search times.
+    """
+    if stats is None:
+        cands = search(initial_candidates(clues, tables), tables, deadline)
+    else:
+        start = time.perf_counter()
+        cands = initial_candidates(clues, tables)
+        searched = time.perf_counter()
+        cands = search(cands, tables, deadline, stats)
+        stats.presolve_time += searched - start
+        stats.search_time += time.perf_counter() - searched
+    if not cands:
+        return cands
+    return [bit_value[m] for m in cands]
@@ -0,0 +1,128 @@
+## Solution cache keyed by canonical puzzle
+##
+## Puzzles that differ only by relabelling the digits, or by one of the 8
+## rotations and reflections of the samurai layout (which move the corner
+## grids a-d onto each other), share one cache entry. The key is the smallest
+## of the 8 transformed clue vectors, each relabelled by order of first
+## appearance; the stored solution is in that canonical frame and is mapped
+## back to the caller's orientation and digits on a hit.
+
+import sqlite3
+from operator import itemgetter
+from collections import OrderedDict
+import samurai
+from topology import SAMURAI
+from samurai import squares, clue_vector, SamuraiGrid
+
+# Position of every cell in the 21x21 layout
+cell_position = SAMURAI.positions
+position_cell = SAMURAI.index
+
+# The symmetries of the square layout, as maps of (row, col)
+SYMMETRIES = [
+    lambda r, c: (r, c),
+    lambda r, c: (c, 20 - r),
+    lambda r, c: (20 - r, 20 - c),
+    lambda r, c: (20 - c, r),
+    lambda r, c: (r, 20 - c),
+    lambda r, c: (20 - r, c),
+    lambda r, c: (c, r),
+    lambda r, c: (20 - c, 20 - r),
+]
+
+# For each symmetry, the cell that lands on each index, and the reverse
+gather = []
+scatter = []
+for f in SYMMETRIES:
+    target = [position_cell[f(*p)] for p in cell_position]
+    source = [0] * len(squares)
+    for i, j in enumerate(target):
+        source[j] = i
+    gather.append(itemgetter(*source))
+    scatter.append(itemgetter(*target))
+
+
+def canonical(cells):
+    """Return (key, symmetry, relabel table) for a clue vector.
+
+    key is the canonical 369-byte clue vector; relabel maps original digit
+    values to canonical ones and is a full permutation of 1-9.
+    """
+    best = None
+    for t, take in enumerate(gather):
+        moved = bytes(take(cells))
+        order = [d for d in dict.fromkeys(moved) if d]
+        order += [d for d in range(1, 10) if d not in order]
+        table = bytearray(range(256))
+        for label, d in enumerate(order, 1):
+            table[d] = label
+        key = moved.translate(table)
+        if best is None or key < best[0]:
+            best = (key, t, bytes(table))
+    return best
+
+
+class SolutionCache:
+    """LRU cache of canonical solutions, optionally backed by a SQLite file."""
+
+    def __init__(self, maxsize=10000, path=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            self.db.execute('CREATE TABLE IF NOT EXISTS solutions (key BLOB PRIMARY KEY, solution BLOB)')
+
+    def lookup(self, key):
+        """Return the canonical solution for key, b'' if unsolvable, None if unknown."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.db is not None:
+            row = self.db.execute('SELECT solution FROM solutions WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.remember(key, bytes(row[0]))
+                return bytes(row[0])
+        return None
+
+    def remember(self, key, solution):
+        """Keep solution in memory, evicting the least recently used entries."""
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def store(self, key, solution):
+        """Record solution (b'' for unsolvable) in memory and on disk."""
+        self.remember(key, solution)
+        if self.db is not None:
+            self.db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?)', (key, solution))
+            self.db.commit()
+
+    def solve(self, grid, engine='cpsat', timeout=None):
+        """Solve like samurai.solve, skipping the solver for any cached equivalent puzzle."""
+        cells = bytes(clue_vector(grid))
+        key, t, table = canonical(cells)
+        solution = self.lookup(key)
+        if solution is not None:
+            self.hits += 1
+            if not solution:
+                return False
+            inverse = bytearray(256)
+            for d in range(10):
+                inverse[table[d]] = d
+            return SamuraiGrid(bytes(scatter[t](solution)).translate(inverse))
+
+        self.misses += 1
+        result = samurai.solve(SamuraiGrid(cells), engine, timeout)
+        if result:
+            self.store(key, bytes(gather[t](result.cells)).translate(table))
+        else:
+            self.store(key, b'')
+        return result
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
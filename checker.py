@@ -1,13 +1,20 @@
+from itertools import islice
+from numbers import Integral
+from collections.abc import Mapping, Sequence
+import arrays
+from topology import SAMURAI, local_units
+
 # define global variable
 digits = '123456789'
 rows = 'ABCDEFGHI'
 cols = digits
 
 
-def checker(values, sqrs):
+def checker(values, sqrs, verbose=True):
     """
     Given the values and squares of a samurai sudoku
     Return True if its a valid samurai sudoku, False otherwise
+    Print the verdict unless verbose is False
     """
     # samurai sudoku in the order of top left, top right, bottom left,
     # bottom right, middle
@@ -18,22 +25,25 @@ def checker(values, sqrs):
 
     for sudoku in samurai:
         if not check_sudoku(sudoku):
-            print("Invalid Samurai Sudoku.")
+            if verbose:
+                print("Invalid Samurai Sudoku.")
             return False
 
+    # top left corner of each shared box, in both grids sharing it
     corners_coordinate = [
-        [[samurai[0], [6, 6]], [samurai[4], [0, 0]]],
-        [[samurai[1], [6, 0]], [samurai[4], [0, 6]]],
-        [[samurai[2], [0, 6]], [samurai[4], [6, 0]]],
-        [[samurai[3], [0, 0]], [samurai[4], [6, 6]]]
+        [[samurai[k], divmod(SAMURAI.local(k, shared[0]), 9)],
+         [samurai[j], divmod(SAMURAI.local(j, shared[0]), 9)]]
+        for k, j, shared in SAMURAI.overlaps
     ]
     # check overlapped corners
     for corner in corners_coordinate:
         if not check_corners(corner[0], corner[1]):
-            print("Invalid Samurai Sudoku")
+            if verbose:
+                print("Invalid Samurai Sudoku")
             return False
 
-    print("Solution has been verified, valid Samurai Sudoku.")
+    if verbose:
+        print("Solution has been verified, valid Samurai Sudoku.")
     return True
 
 def check_sudoku(sudoku):
@@ -128,3 +138,102 @@ def matrix2list(matrix):
     Return a flatten list
     """
     return [val for sublist in matrix for val in sublist]
+
+
+################ Vectorized checker ################
+
+# numpy is loaded by the first vectorized check (see arrays.py), so importing
+# the checker (as samurai does) costs nothing extra
+
+
+def grid_digits(grid, topology=SAMURAI):
+    """
+    Given one grid in any form check_many accepts, return its cell digits:
+    a SamuraiGrid's bytes, a mapping's values in topology cell order, the
+    digits of a string, or the grid itself when it is a sequence of digits
+    """
+    grid = getattr(grid, 'cells', grid)
+    if isinstance(grid, Mapping):
+        return [int(grid[s]) for s in topology.names]
+    if isinstance(grid, str):
+        return [0 if c == '.' else int(c) for c in grid]
+    return grid
+
+
+def is_one_grid(grids):
+    """True if grids is a single grid rather than a collection of them."""
+    if hasattr(grids, 'cells') or isinstance(grids, (Mapping, str, bytes, bytearray)):
+        return True
+    if hasattr(grids, 'ndim'):
+        return grids.ndim == 1
+    return isinstance(grids, Sequence) and len(grids) > 0 and isinstance(grids[0], Integral)
+
+
+def unit_layout(width, topology):
+    """
+    Given the number of cells per grid, return the (units, 9) cell indices
+    of every unit and the pairs of cell index arrays that must agree
+    """
+    np = arrays.np
+    unit_index = np.array(local_units)
+    count = len(topology.grids)
+    if width == len(topology):
+        # shared cells are stored once, so the overlaps hold by construction
+        return np.asarray(topology.grids)[:, unit_index].reshape(-1, 9), []
+    if width == 81 * count:
+        units = (81 * np.arange(count)[:, None, None] + unit_index).reshape(-1, 9)
+        overlaps = [(81 * k + np.array([topology.local(k, i) for i in shared]),
+                     81 * j + np.array([topology.local(j, i) for i in shared]))
+                    for k, j, shared in topology.overlaps]
+        return units, overlaps
+    raise ValueError("Expected %d or %d cells per grid, got %d" % (len(topology), 81 * count, width))
+
+
+def check_many(grids, topology=SAMURAI):
+    """
+    Given one grid or many, check every unit of all sudokus and every
+    overlap in one vectorized pass per chunk of grids
+    A grid may be a mapping such as a SamuraiGrid or another solve() result,
+    or a string or sequence of digits of length cells in topology cell order
+    (samurai.squares for the samurai), or 81 * grids holding the sudokus one
+    after another, e.g. 405 for the samurai
+    Many grids may be an (N, cells) or (N, 81 * grids) array, or any
+    iterable of single grids, which is read one chunk at a time
+    Return a boolean for a single grid, a boolean mask of shape (N,) otherwise
+    """
+    np = arrays.load()
+    if is_one_grid(grids):
+        arr = np.asarray(grid_digits(grids, topology), dtype=np.uint8)[None]
+        return bool(check_chunk(arr, *unit_layout(arr.shape[1], topology))[0])
+    if hasattr(grids, 'ndim'):
+        chunks = (grids[start:start + arrays.CHUNK] for start in range(0, len(grids), arrays.CHUNK))
+    else:
+        grids = iter(grids)
+        chunks = iter(lambda: [grid_digits(grid, topology) for grid in islice(grids, arrays.CHUNK)], [])
+    valid = []
+    layouts = {}
+    for chunk in chunks:
+        arr = np.asarray(chunk, dtype=np.uint8)
+        if arr.ndim != 2:
+            raise ValueError("Grids must all have the same number of cells")
+        if arr.shape[1] not in layouts:
+            layouts[arr.shape[1]] = unit_layout(arr.shape[1], topology)
+        valid.append(check_chunk(arr, *layouts[arr.shape[1]]))
+    return np.concatenate(valid) if valid else np.zeros(0, dtype=bool)
+
+
+def check_chunk(arr, units, overlaps):
+    """
+    Given an (n, cells) array of digits, the (units, 9) cell indices of every
+    unit and pairs of cell indices that must agree, return the (n,) validity mask
+    """
+    # a unit is valid when the OR of its nine digit bits has all nine bits set
+    bits = arrays.digit_bits[arr]
+    seen = bits.take(units[:, 0], axis=1)
+    for j in range(1, 9):
+        seen |= bits.take(units[:, j], axis=1)
+    valid = (seen == 0x1FF).all(axis=1)
+
+    for first, second in overlaps:
+        valid &= (arr.take(first, axis=1) == arr.take(second, axis=1)).all(axis=1)
+    return valid
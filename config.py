@@ -0,0 +1,47 @@
+## Solver settings shared by samurai.solve, analyse.solve_with_timeout and sudoku.solve
+##
+##   num_workers       CP-SAT search workers; None leaves CP-SAT to use every core
+##   random_seed       CP-SAT random seed
+##   search_branching  CP-SAT branching strategy by name, e.g. 'FIXED_SEARCH' or
+##                     'PORTFOLIO_SEARCH'; None keeps CP-SAT's automatic choice
+##   presolve          False skips the CP-SAT presolve
+##   max_time          default time limit in seconds when a solve is given none
+##   portfolio         a native engine ('bitmask', 'dlx' or 'decompose') to race
+##                     against CP-SAT; the first to finish gives the answer
+##   propagate         run native propagation (singles and locked candidates)
+##                     first and give CP-SAT only the cells it leaves open, or
+##                     skip CP-SAT entirely when it solves the puzzle
+##
+## DEFAULT suits one hard puzzle on a many-core machine. BATCH is what
+## samurai.solve_many uses: one CP-SAT worker per puzzle, so a pool with a
+## process per core keeps every core busy without oversubscribing them.
+
+from collections import namedtuple
+
+
+class SolverConfig(namedtuple('SolverConfig', 'num_workers random_seed search_branching '
+                                              'presolve max_time portfolio propagate',
+                               defaults=(None, None, None, True, None, None, False))):
+    __slots__ = ()
+
+    def apply(self, parameters, timeout=None):
+        """Set these options on a CP-SAT parameters object; timeout overrides max_time."""
+        timeout = self.time_limit(timeout)
+        if timeout is not None:
+            parameters.max_time_in_seconds = timeout
+        if self.num_workers is not None:
+            parameters.num_workers = self.num_workers
+        if self.random_seed is not None:
+            parameters.random_seed = self.random_seed
+        if self.search_branching is not None:
+            parameters.search_branching = getattr(type(parameters), self.search_branching)
+        if not self.presolve:
+            parameters.cp_model_presolve = False
+
+    def time_limit(self, timeout=None):
+        """Return the time limit to use: timeout if given, else max_time."""
+        return self.max_time if timeout is None else timeout
+
+
+DEFAULT = SolverConfig()
+BATCH = SolverConfig(num_workers=1)
@@ -0,0 +1,132 @@
+## Decomposed solving through the four shared boxes
+##
+## The five grids only interact through the 36 cells of the boxes the middle
+## grid shares with the corners. Once those are fixed, each grid is an
+## ordinary 81-cell sudoku that can be solved on its own. So the search here
+## only branches on shared cells (propagating across the whole samurai after
+## each choice), and each grid is then solved separately, possibly in
+## parallel. A corner's result depends on nothing but its box, so it is
+## memoised by the box's digits: backtracking over the boxes never solves the
+## same corner twice.
+
+import time
+import bitmask
+from bitmask import popcount, bit_value
+from topology import SUDOKU
+from samurai import tables, subgrid_indices, overlap_indices, clue_vector, SamuraiGrid, TimeoutException
+
+# Every grid is laid out like a plain sudoku, so one set of 81-cell tables serves all five
+grid_tables = SUDOKU.tables
+overlap_cells = sorted(set(i for box in overlap_indices for i in box))
+
+
+def solve_part(cands, deadline=None):
+    """Solve one 81-cell grid from its candidates; None on timeout."""
+    return bitmask.search(cands, grid_tables, deadline)
+
+
+def run_parts(parts, executor=None, deadline=None):
+    """Solve a list of grid candidate lists, on executor if given and worth it."""
+    if executor is None or len(parts) < 2:
+        return [solve_part(cands, deadline) for cands in parts]
+    return list(executor.map(solve_part, parts, [deadline] * len(parts)))
+
+
+def choose_overlap(cands):
+    """Return the unsolved shared cell with the fewest candidates, or -1."""
+    best, best_count = -1, 10
+    for i in overlap_cells:
+        n = popcount[cands[i]]
+        if 1 < n < best_count:
+            best, best_count = i, n
+            if n == 2:
+                break
+    return best
+
+
+def search(cands, memo, executor=None, deadline=None, stats=None):
+    """Branch on shared cells until every grid can be solved on its own.
+
+    memo[k] maps the digits of box k to the solved corner k (or False).
+    Return the full candidate list of a solution, False, or None on timeout.
+    """
+    if cands is False:
+        if stats is not None:
+            stats.fail()
+        return False
+    if deadline is not None and time.monotonic() > deadline:
+        return None
+
+    # Settle every corner whose shared box is now fixed
+    keys, new = [], []
+    for k, box in enumerate(overlap_indices):
+        if all(popcount[cands[i]] == 1 for i in box):
+            key = bytes(bit_value[cands[i]] for i in box)
+            keys.append(key)
+            if key not in memo[k]:
+                new.append(k)
+        else:
+            keys.append(None)
+    solved = run_parts([[cands[i] for i in subgrid_indices[k]] for k in new], executor, deadline)
+    for k, result in zip(new, solved):
+        if result is None:
+            return None
+        memo[k][keys[k]] = result
+    if any(key is not None and memo[k][key] is False for k, key in enumerate(keys)):
+        if stats is not None:
+            stats.fail()
+        return False
+
+    best = choose_overlap(cands)
+    if best < 0:
+        middle = solve_part([cands[i] for i in subgrid_indices[4]], deadline)
+        if not middle:
+            if middle is False and stats is not None:
+                stats.fail()
+            return middle
+        cands = cands[:]
+        for k, part in enumerate([memo[k][key] for k, key in enumerate(keys)] + [middle]):
+            for i, m in zip(subgrid_indices[k], part):
+                cands[i] = m
+        return cands
+
+    m = cands[best]
+    if stats is not None:
+        stats.descend()
+    for b in bitmask.mask_bits[m]:
+        if stats is not None:
+            stats.guess()
+        result = search(bitmask.eliminate_all(cands[:], tables, [(best, m & ~b)]),
+                        memo, executor, deadline, stats)
+        if result or result is None:
+            return result
+    if stats is not None:
+        stats.ascend()
+    return False
+
+
+def solve(clues, executor=None, deadline=None, stats=None):
+    """Solve a list of clue digits; return the solution digits, False, or None on timeout.
+
+    executor, such as a concurrent.futures pool, solves independent grids
+    in parallel. deadline is a time.monotonic() value.
+    """
+    start = time.perf_counter()
+    cands = bitmask.initial_candidates(clues, tables)
+    searched = time.perf_counter()
+    cands = search(cands, [{}, {}, {}, {}], executor, deadline, stats)
+    if stats is not None:
+        stats.presolve_time += searched - start
+        stats.search_time += time.perf_counter() - searched
+    if not cands:
+        return cands
+    return [bit_value[m] for m in cands]
+
+
+def solve_grid(grid, executor=None, timeout=None):
+    """Solve grid like samurai.solve; return a SamuraiGrid or False."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    values = solve(clue_vector(grid), executor, deadline)
+    if values is None:
+        raise TimeoutException("No result within %s seconds" % timeout)
+    return SamuraiGrid(values) if values else False
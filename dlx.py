@@ -0,0 +1,120 @@
+## Exact cover solver (Knuth's Algorithm X) for sudoku-like puzzles
+##
+## Columns are the constraints "cell i is filled" and "unit k holds digit d";
+## rows are the (cell, digit) placements. The links are kept as a dict of
+## column -> set of rows that is covered and uncovered in place, which is the
+## usual Python rendering of Dancing Links.
+
+import time
+
+
+def build_rows(tables):
+    """Map each (cell, digit) placement to the columns it covers."""
+    rows = {}
+    for i, ks in enumerate(tables.cell_units):
+        for d in range(1, 10):
+            rows[(i, d)] = [('cell', i)] + [('unit', k, d) for k in ks]
+    return rows
+
+
+def build_columns(rows):
+    """Invert the row table into column -> set of rows."""
+    columns = {}
+    for r, cs in rows.items():
+        for c in cs:
+            columns.setdefault(c, set()).add(r)
+    return columns
+
+
+def select(columns, rows, r):
+    """Cover every column of row r; return the removed columns for deselect."""
+    removed = []
+    for j in rows[r]:
+        for i in columns[j]:
+            for k in rows[i]:
+                if k != j:
+                    columns[k].remove(i)
+        removed.append(columns.pop(j))
+    return removed
+
+
+def deselect(columns, rows, r, removed):
+    """Undo select(columns, rows, r) in reverse order."""
+    for j in reversed(rows[r]):
+        columns[j] = removed.pop()
+        for i in columns[j]:
+            for k in rows[i]:
+                if k != j:
+                    columns[k].add(i)
+
+
+def search(columns, rows, partial, deadline=None, stats=None):
+    """Algorithm X, choosing the column with the fewest rows first.
+
+    deadline is a time.monotonic() value; return None if it passes first.
+    stats, if given, is a stats.SolveStats; since exact cover has no separate
+    propagation, every row chosen counts as a guess, forced or not.
+    """
+    if not columns:
+        return list(partial)
+    if deadline is not None and time.monotonic() > deadline:
+        return None
+    c, fewest = None, 10
+    for col, rs in columns.items():
+        if len(rs) < fewest:
+            c, fewest = col, len(rs)
+            if fewest <= 1:
+                break
+    if stats is not None:
+        if not fewest:
+            stats.fail()
+            return False
+        stats.descend()
+    for r in list(columns[c]):
+        partial.append(r)
+        removed = select(columns, rows, r)
+        if stats is not None:
+            stats.guess()
+        result = search(columns, rows, partial, deadline, stats)
+        if result or result is None:
+            return result
+        deselect(columns, rows, r, removed)
+        partial.pop()
+    if stats is not None:
+        stats.ascend()
+    return False
+
+
+def solve(clues, tables, rows=None, columns=None, deadline=None, stats=None):
+    """Solve a list of clue digits; return the solution digits, False, or None on timeout.
+
+    rows and columns may be passed in prebuilt; columns is copied, not mutated.
+    stats, if given, also gets the presolve (clue selection) and search times.
+    """
+    start = time.perf_counter()
+    if rows is None:
+        rows = build_rows(tables)
+    if columns is None:
+        columns = build_columns(rows)
+    else:
+        columns = dict((c, set(rs)) for c, rs in columns.items())
+    partial = []
+    for i, d in enumerate(clues):
+        if d:
+            if any(c not in columns for c in rows[(i, d)]):
+                if stats is not None:
+                    stats.presolve_time += time.perf_counter() - start
+                return False
+            select(columns, rows, (i, d))
+            partial.append((i, d))
+    searched = time.perf_counter()
+    result = search(columns, rows, partial, deadline, stats)
+    if stats is not None:
+        stats.presolve_time += searched - start
+        stats.search_time += time.perf_counter() - searched
+    if not result:
+        return result
+    values = [0] * len(clues)
+    for i, d in result:
+        values[i] = d
+    return values
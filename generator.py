@@ -0,0 +1,149 @@
+## Generate unique Samurai Sudoku puzzles
+##
+## A full solution is built across all 369 cells at once, so the corner grids
+## and the middle grid agree on the shared boxes by construction. Clues from it
+## are added in random order until propagation alone fixes every cell, which
+## makes the puzzle unique. Clues are then removed in random order, keeping
+## each removal only if the puzzle still has exactly one solution.
+##
+## Each removal is one uniqueness check in pure Python, so one process makes
+## roughly one puzzle a second at 17 clues per grid and several a second at
+## 25; generate_many(workers=N) scales that across cores. That is well short
+## of thousands a minute per core at the sparse targets.
+
+import sys
+import time
+import random
+import bitmask
+import samurai
+from concurrent.futures import ProcessPoolExecutor
+from bitmask import ALL, popcount, mask_bits, bit_value
+from samurai import squares, tables, subgrid_indices, SamuraiGrid, TimeoutException
+from config import BATCH
+
+# Grids (0-3 corners a-d, 4 middle) that each cell belongs to
+cell_grids = [[] for _ in squares]
+for k, indices in enumerate(subgrid_indices):
+    for i in indices:
+        cell_grids[i].append(k)
+
+
+def fill(cands, rng):
+    """Complete cands with MRV search, trying each cell's digits in random order."""
+    if cands is False:
+        return False
+    i = bitmask.choose_cell(cands)
+    if i < 0:
+        return cands
+    m = cands[i]
+    for b in rng.sample(mask_bits[m], len(mask_bits[m])):
+        result = fill(bitmask.eliminate_all(cands[:], tables, [(i, m & ~b)]), rng)
+        if result:
+            return result
+    return False
+
+
+def random_solution(rng=random):
+    """Return a random fully solved samurai as a list of digits in `squares` order."""
+    return [bit_value[m] for m in fill([ALL] * len(squares), rng)]
+
+
+# Seconds the native search gets to settle one uniqueness check, and CP-SAT
+# after it. Intermediate puzzles during clue removal can be far harder for a
+# singles-only search than the finished puzzle, so neither is left unbounded.
+SEARCH_TIME = 0.05
+CPSAT_TIME = 5.0
+
+
+def has_other_solution(puzzle, i, d):
+    """True if puzzle has a solution with digit d not in cell i.
+
+    When puzzle plus the clue (i, d) has a unique solution, this is exactly the
+    question of whether removing that clue breaks uniqueness, and it usually
+    fails by propagation alone instead of needing a second solution.
+
+    If the native search runs out of time, CP-SAT counts the solutions of
+    puzzle instead. count_solutions raises TimeoutException unless the count
+    is settled, and then the answer is True, so the caller keeps the clue
+    and the puzzle stays unique.
+    """
+    cands = bitmask.presolve(puzzle, tables)
+    if cands is False:
+        return False
+    cands = bitmask.eliminate(cands, i, d, tables)
+    found = bitmask.search(cands, tables, time.monotonic() + SEARCH_TIME)
+    if found is not None:
+        return bool(found)
+    try:
+        return samurai.count_solutions(SamuraiGrid(puzzle), 2, timeout=CPSAT_TIME, config=BATCH) > 1
+    except (ImportError, TimeoutException):
+        return True
+
+
+def generate(clues=17, rng=random):
+    """Return a unique puzzle as a SamuraiGrid.
+
+    clues is the target number of clues per grid, either one number or five
+    (corners a-d, then middle); shared cells count towards both grids. Targets
+    below what uniqueness allows are approached as closely as the random
+    removal order permits.
+    """
+    targets = [clues] * 5 if isinstance(clues, int) else list(clues)
+    solution = random_solution(rng)
+    n = len(solution)
+
+    # Add clues until propagation determines every cell
+    puzzle = [0] * n
+    cands = [ALL] * n
+    for i in rng.sample(range(n), n):
+        if popcount[cands[i]] > 1:
+            puzzle[i] = solution[i]
+            cands = bitmask.assign(cands, i, solution[i], tables)
+            if bitmask.choose_cell(cands) < 0:
+                break
+
+    # Remove the clues uniqueness does not need, down to the targets
+    counts = [sum(1 for i in indices if puzzle[i]) for indices in subgrid_indices]
+    for i in rng.sample(range(n), n):
+        if not puzzle[i] or any(counts[k] <= targets[k] for k in cell_grids[i]):
+            continue
+        d = puzzle[i]
+        puzzle[i] = 0
+        if has_other_solution(puzzle, i, d):
+            puzzle[i] = d
+        else:
+            for k in cell_grids[i]:
+                counts[k] -= 1
+    return SamuraiGrid(puzzle)
+
+
+def generate_seeded(clues, seed):
+    """Generate one puzzle from its own seed."""
+    return generate(clues, random.Random(seed))
+
+
+def generate_many(n, clues=17, seed=None, workers=1):
+    """Yield n puzzles in order; the same seed always gives the same puzzles.
+
+    Every puzzle gets its own seed drawn up front, so the output does not
+    depend on workers, the number of processes generating in parallel.
+    """
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(64) for _ in range(n)]
+    if workers == 1:
+        for s in seeds:
+            yield generate_seeded(clues, s)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(generate_seeded, [clues] * n, seeds)
+
+
+if __name__ == '__main__':
+    # python generator.py [count] [clues] [seed] [workers]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    clues = int(sys.argv[2]) if len(sys.argv) > 2 else 17
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    for puzzle in generate_many(count, clues, seed, workers):
+        print('\n'.join(puzzle.lines()))
+        print()
@@ -0,0 +1,295 @@
+## Grade puzzles by the human techniques needed to solve them
+##
+## The grader solves the way a person would: it always uses the easiest
+## technique that still makes progress, and only goes up the ladder when the
+## easier ones are stuck.
+##
+##   singles            naked and hidden singles
+##   locked candidates  pointing and claiming, across every crossing of two
+##                      units, including a shared box and a row of either grid
+##   pairs/triples      naked and hidden pairs and triples in any unit
+##   x-wing             a digit in two rows (or columns) of one 9x9 grid,
+##                      confined to the same two columns (or rows)
+##   guessing           MRV search with singles, once nothing above applies
+##
+## Everything runs on a bitmask candidate list (see bitmask.py), updated in
+## place by eliminate_all after each round, so grading never touches CP-SAT.
+## The trail eliminate_all keeps of each round tells which cells changed, and
+## from it Marks updates per-unit digit places and dirty flags, so every
+## technique re-examines only the units (and, for x-wings, the digits) that
+## changed since it last looked.
+## The grade is the hardest technique used; steps counts, per technique,
+## the cells solved by singles, the patterns that ruled something out, or
+## the guesses made.
+##
+##     python grader.py PUZZLE_FILE...
+
+import sys
+from collections import namedtuple
+from itertools import combinations
+import bitmask
+import validate
+from bitmask import popcount, mask_bits, bit_value
+from stats import SolveStats
+from topology import SAMURAI
+
+TECHNIQUES = ('singles', 'locked candidates', 'pairs/triples', 'x-wing', 'guessing')
+
+# level indexes TECHNIQUES; solution is the solved digits, or False
+Grade = namedtuple('Grade', 'level technique steps solution')
+
+
+class Lines:
+    """Index tables of a topology for the incremental grader, built once per layout.
+
+    rows and cols hold, per 9x9 grid, the unit numbers of its rows and its
+    columns; positions[i] lists (unit, position in unit) for cell i; locked[k]
+    lists the intersections whose first unit is k, as in tables.intersections.
+    """
+
+    def __init__(self, topology):
+        tables = topology.tables
+        number = dict((frozenset(u), k) for k, u in enumerate(tables.units))
+        self.rows = [[number[frozenset(cells[r * 9:r * 9 + 9])] for r in range(9)] for cells in topology.grids]
+        self.cols = [[number[frozenset(cells[c::9])] for c in range(9)] for cells in topology.grids]
+        self.positions = [[] for _ in range(len(topology))]
+        for k, u in enumerate(tables.units):
+            for p, i in enumerate(u):
+                self.positions[i].append((k, p))
+        self.locked = [[] for _ in tables.units]
+        for rest, inside, outside in tables.intersections:
+            self.locked[number[frozenset(rest + inside)]].append((rest, inside, outside))
+
+
+_lines = {}
+
+
+def get_lines(topology):
+    """Return the Lines of topology, building them only once."""
+    if topology.name not in _lines:
+        _lines[topology.name] = Lines(topology)
+    return _lines[topology.name]
+
+
+class Marks:
+    """What changed in a candidate list since each technique last looked at it.
+
+    places[k][d] has bit p set while position p of unit k may hold digit d+1.
+    Each technique keeps its own dirty marks, since a round that stops at an
+    easier rung must not hide a change from the harder ones: locked and
+    subsets hold the unit numbers to rescan, xwing the digits removed from
+    each unit. update() folds in the trail of one eliminate_all call, so
+    only the units it touched are examined again.
+    """
+
+    def __init__(self, cands, topology):
+        self.lines = get_lines(topology)
+        units = topology.tables.units
+        self.places = [[0] * 9 for _ in units]
+        for k, u in enumerate(units):
+            places = self.places[k]
+            for p, i in enumerate(u):
+                for b in mask_bits[cands[i]]:
+                    places[b.bit_length() - 1] |= 1 << p
+        self.locked = set(range(len(units)))
+        self.subsets = set(range(len(units)))
+        self.xwing = [bitmask.ALL] * len(units)
+        self.solved = solved_count(cands)
+
+    def update(self, cands, trail):
+        """Record the changes eliminate_all made to cands, given its trail."""
+        first = {}
+        for i, old in trail:
+            first.setdefault(i, old)
+        for i, old in first.items():
+            removed = old & ~cands[i]
+            if popcount[old] > 1 and popcount[cands[i]] == 1:
+                self.solved += 1
+            for k, p in self.lines.positions[i]:
+                self.locked.add(k)
+                self.subsets.add(k)
+                self.xwing[k] |= removed
+                places = self.places[k]
+                for b in mask_bits[removed]:
+                    places[b.bit_length() - 1] &= ~(1 << p)
+
+
+def take(dirty):
+    """Return the dirty unit numbers in order, clearing them."""
+    units = sorted(dirty)
+    dirty.clear()
+    return units
+
+
+def find_locked(cands, marks):
+    """Find locked candidates, as bitmask.find_locked, in the units marked as changed."""
+    found = 0
+    pending = []
+    for k in take(marks.locked):
+        for rest, inside, outside in marks.lines.locked[k]:
+            inner = outer = 0
+            for i in inside:
+                inner |= cands[i]
+            for i in rest:
+                outer |= cands[i]
+            locked = inner & ~outer
+            if locked:
+                count = len(pending)
+                for i in outside:
+                    if cands[i] & locked:
+                        pending.append((i, locked))
+                found += len(pending) > count
+    return found, pending
+
+
+def find_subsets(cands, tables, marks):
+    """Find naked and hidden pairs and triples in the units marked as changed.
+
+    Return the number of subsets that rule something out and the (cell, bits)
+    eliminations.
+    """
+    found = 0
+    pending = []
+    for k in take(marks.subsets):
+        unit = tables.units[k]
+        # bit p set when position p of the unit is still open
+        open_at = 0
+        for p, i in enumerate(unit):
+            if popcount[cands[i]] > 1:
+                open_at |= 1 << p
+        if popcount[open_at] < 4:
+            continue
+        open_cells = [i for i in unit if popcount[cands[i]] > 1]
+        places = [(1 << d, where & open_at) for d, where in enumerate(marks.places[k]) if where & open_at]
+        for size in (2, 3):
+            # naked: size cells holding only size digits between them
+            small = [i for i in open_cells if popcount[cands[i]] <= size]
+            for cells in combinations(small, size):
+                digits = 0
+                for i in cells:
+                    digits |= cands[i]
+                if popcount[digits] == size:
+                    count = len(pending)
+                    for i in open_cells:
+                        if i not in cells and cands[i] & digits:
+                            pending.append((i, digits))
+                    found += len(pending) > count
+            # hidden: size digits with only size places between them
+            few = [item for item in places if popcount[item[1]] <= size]
+            for chosen in combinations(few, size):
+                where = digits = 0
+                for b, at in chosen:
+                    where |= at
+                    digits |= b
+                if popcount[where] == size:
+                    count = len(pending)
+                    for p in mask_bits[where]:
+                        i = unit[p.bit_length() - 1]
+                        if cands[i] & ~digits:
+                            pending.append((i, cands[i] & ~digits))
+                    found += len(pending) > count
+    return found, pending
+
+
+def find_xwings(cands, tables, marks):
+    """Find x-wings within the rows and columns of each 9x9 grid.
+
+    Only digits removed from some line of a grid since the last scan are
+    looked at again there. Return the number of x-wings that rule something
+    out and the (cell, bits) eliminations.
+    """
+    found = 0
+    pending = []
+    units = tables.units
+    for rows, cols in zip(marks.lines.rows, marks.lines.cols):
+        for lines, across in ((rows, cols), (cols, rows)):
+            changed = 0
+            for k in lines:
+                changed |= marks.xwing[k]
+                marks.xwing[k] = 0
+            for b in mask_bits[changed]:
+                d = b.bit_length() - 1
+                # places of b along a line -> lines with exactly those two
+                pairs = {}
+                for n, k in enumerate(lines):
+                    where = marks.places[k][d]
+                    if popcount[where] == 2:
+                        pairs.setdefault(where, []).append(n)
+                for where, ns in pairs.items():
+                    if len(ns) != 2:
+                        continue
+                    count = len(pending)
+                    for p in mask_bits[where]:
+                        for n, i in enumerate(units[across[p.bit_length() - 1]]):
+                            if n not in ns and cands[i] & b:
+                                pending.append((i, b))
+                    found += len(pending) > count
+    return found, pending
+
+
+def solved_count(cands):
+    return sum(1 for m in cands if popcount[m] == 1)
+
+
+def grade_clues(clues, topology=SAMURAI):
+    """Grade a list of clue digits; return a Grade.
+
+    A puzzle whose clues contradict each other grades as singles with
+    solution False. A puzzle with several solutions is graded on the way to
+    the first one the search finds.
+    """
+    tables = topology.tables
+    steps = [0] * len(TECHNIQUES)
+    level = 0
+    cands = bitmask.initial_candidates(clues, tables)
+    if cands is False:
+        return Grade(0, TECHNIQUES[0], dict(zip(TECHNIQUES, steps)), False)
+    marks = Marks(cands, topology)
+    steps[0] = marks.solved - sum(1 for d in clues if d)
+
+    ladder = [lambda: find_locked(cands, marks),
+              lambda: find_subsets(cands, tables, marks),
+              lambda: find_xwings(cands, tables, marks)]
+    while cands and marks.solved < len(cands):
+        for rung, find in enumerate(ladder, 1):
+            found, pending = find()
+            if pending:
+                break
+        else:
+            # Nothing but guessing is left
+            record = SolveStats('grader')
+            cands = bitmask.search(cands, tables, stats=record)
+            steps[-1] += record.guesses
+            level = len(TECHNIQUES) - 1
+            break
+        before = marks.solved
+        trail = []
+        cands = bitmask.eliminate_all(cands, tables, pending, trail)
+        steps[rung] += found
+        level = max(level, rung)
+        if cands:
+            marks.update(cands, trail)
+            steps[0] += marks.solved - before
+    solution = [bit_value[m] for m in cands] if cands else False
+    return Grade(level, TECHNIQUES[level], dict(zip(TECHNIQUES, steps)), solution)
+
+
+def grade(grid, topology=SAMURAI):
+    """Grade a puzzle in any form validate.read accepts; return a Grade.
+
+    Raise ValueError if grid cannot be read.
+    """
+    clues = validate.read(grid, topology)
+    if isinstance(clues, validate.Invalid):
+        raise ValueError(clues.message)
+    return grade_clues(clues, topology)
+
+
+if __name__ == '__main__':
+    import puzzleio
+    for path in sys.argv[1:]:
+        for n, puzzle in enumerate(puzzleio.read(path)):
+            result = grade(puzzle)
+            print('%s:%d %s %s' % (path, n, result.technique if result.solution else 'unsolvable',
+                                   ' '.join('%s=%d' % (t.replace(' ', '_'), c)
+                                            for t, c in result.steps.items() if c)))
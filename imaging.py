@@ -1,6 +1,3 @@
-import numpy as np
-import seaborn as sns
-import pandas as pd
 import sys
 
 
@@ -13,10 +10,21 @@ import sys
 #
 # To run in command line: 
 # 	python imaging.py FILE_PATH.csv
+# 	python imaging.py FILE_PATH.npz [FIELD]
 #
 # Note: CSV files must include at top of file: Y-Axis, X-Axis, Number of Hits
+# An .npz file written by analyse.py is drawn straight from its arrays by
+# analytics.plot, all five grids at once; FIELD is solved (default),
+# unsolvable, timeout, clues, time or rate.
 
-if __name__ == '__main__' and len(sys.argv) == 2:
+if __name__ == '__main__' and len(sys.argv) >= 2 and sys.argv[1].endswith('.npz'):
+	from analytics import ClueStats, plot
+	stats = ClueStats.load(sys.argv[1])
+	field = sys.argv[2] if len(sys.argv) > 2 else 'solved'
+	plot(stats.field(field), '%s (%d puzzles)' % (field, stats.count))
+elif __name__ == '__main__' and len(sys.argv) == 2:
+	import seaborn as sns
+	import pandas as pd
 	file_path = sys.argv[1]
 	sns.set()
 	data = pd.read_csv(file_path)
@@ -0,0 +1,180 @@
+## Streaming reader and writer for multi-puzzle files
+##
+## Two formats hold any number of puzzles:
+##   text:   one puzzle per line, 369 characters in samurai.squares order,
+##           '0' or '.' for empties; blank lines and '#' comments are skipped
+##   binary: an 8-byte MAGIC header followed by fixed 185-byte records, each
+##           cell packed into 4 bits, first cell in the high nibble
+##
+## Binary files are memory-mapped, so puzzle n can be read without parsing
+## the rest of the file. Readers are generators and can be passed straight to
+## samurai.solve_many.
+##
+## To run in command line:
+##     python puzzleio.py convert SOURCE DEST     (DEST ending in .sam is binary)
+##     python puzzleio.py solve SOURCE [ENGINE] [WORKERS]
+
+import os
+import sys
+import mmap
+from samurai import squares, SamuraiGrid, solve_many
+
+MAGIC = b'SAMURAI\x01'
+RECORD_SIZE = (len(squares) + 1) // 2
+
+# Byte translations: cell value to high nibble, and record byte to its high / low cell value
+_to_high = bytes((b << 4) & 0xFF for b in range(256))
+_from_high = bytes(b >> 4 for b in range(256))
+_from_low = bytes(b & 15 for b in range(256))
+
+
+def pack(grid):
+    """Pack a SamuraiGrid into one binary record."""
+    cells = grid.cells + b'\x00'
+    high = int.from_bytes(cells[0::2].translate(_to_high), 'big')
+    low = int.from_bytes(cells[1::2], 'big')
+    return (high | low).to_bytes(RECORD_SIZE, 'big')
+
+
+def unpack(record):
+    """Unpack one binary record into a SamuraiGrid."""
+    cells = bytearray(2 * RECORD_SIZE)
+    cells[0::2] = record.translate(_from_high)
+    cells[1::2] = record.translate(_from_low)
+    return SamuraiGrid(cells[:len(squares)])
+
+
+################ Text format ################
+
+def read_text(path):
+    """Yield the puzzles of a one-puzzle-per-line file as SamuraiGrids."""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield SamuraiGrid.from_string(line)
+
+
+def write_text(path, grids):
+    """Write grids one per line; return the number written."""
+    count = 0
+    with open(path, 'w') as f:
+        for grid in grids:
+            f.write(grid.to_string() + '\n')
+            count += 1
+    return count
+
+
+################ Binary format ################
+
+def write_binary(path, grids):
+    """Write grids as fixed-size packed records; return the number written."""
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        for grid in grids:
+            f.write(pack(grid))
+            count += 1
+    return count
+
+
+class BinaryDataset:
+    """Memory-mapped binary puzzle file with random access by puzzle number."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < len(MAGIC):
+            self.file.close()
+            raise ValueError("%s is not a samurai dataset" % path)
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC or (size - len(MAGIC)) % RECORD_SIZE:
+            self.close()
+            raise ValueError("%s is not a samurai dataset" % path)
+        self.count = (size - len(MAGIC)) // RECORD_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError(n)
+        start = len(MAGIC) + n * RECORD_SIZE
+        return unpack(self.map[start:start + RECORD_SIZE])
+
+    def __iter__(self):
+        for n in range(self.count):
+            yield self[n]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_binary(path, start=0, stop=None):
+    """Yield puzzles start..stop of a binary file as SamuraiGrids."""
+    with BinaryDataset(path) as dataset:
+        for n in range(start, len(dataset) if stop is None else min(stop, len(dataset))):
+            yield dataset[n]
+
+
+################ Any format ################
+
+def is_binary(path):
+    """True if path starts with the binary MAGIC header."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_layout(path):
+    """Yield the puzzles of a file of 21-line layouts separated by blank lines."""
+    lines = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                lines.append(line)
+            if len(lines) == 21:
+                yield SamuraiGrid.from_grid(lines)
+                lines = []
+
+
+def read(path):
+    """Yield the puzzles of a binary, one-per-line or 21-line layout file."""
+    if is_binary(path):
+        return read_binary(path)
+    with open(path) as f:
+        first = next((line.strip() for line in f if line.strip() and not line.startswith('#')), '')
+    if len(first) == len(squares):
+        return read_text(path)
+    return read_layout(path)
+
+
+def write(path, grids):
+    """Write grids in binary if path ends in .sam, one per line otherwise."""
+    if path.endswith('.sam'):
+        return write_binary(path, grids)
+    return write_text(path, grids)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == 'convert':
+        print("Wrote %d puzzles" % write(sys.argv[3], read(sys.argv[2])))
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'solve':
+        engine = sys.argv[3] if len(sys.argv) > 3 else 'bitmask'
+        workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+        for index, solution, stats in solve_many(read(sys.argv[2]), workers, 16, engine):
+            if solution:
+                print(index, solution.to_string())
+            else:
+                print(index, 'timeout' if solution is None else 'unsolvable')
+    else:
+        print("usage: python puzzleio.py convert SOURCE DEST | solve SOURCE [ENGINE] [WORKERS]")
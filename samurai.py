@@ -1,8 +1,21 @@
 ## Solve Samurai Sudoku with OR-Tools
 
 import os
+import sys
+import time
+import bitmask
+import dlx
+import validate
+from collections.abc import Mapping
+from itertools import islice
 from checker import checker
-from ortools.sat.python import cp_model
+from stats import SolveStats, hooks_active, emit
+from config import DEFAULT, BATCH
+from topology import SAMURAI
+
+# ortools.sat.python.cp_model, imported by the first SamuraiSolver so that
+# the native engines never pay for loading OR-Tools
+cp_model = None
 
 
 def cross(A, B, c=''):
@@ -14,124 +27,565 @@ digits = '123456789'
 rows = 'ABCDEFGHI'
 cols = digits
 
-# Define all squares and units for each sudoku grid
-id_var = 'a'  # top left
-square_a = cross(rows, cols, id_var)
-unitlist_a = ([cross(rows, c, id_var) for c in cols] +
-              [cross(r, cols, id_var) for r in rows] +
-              [cross(rs, cs, id_var) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')])
-
-id_var = 'b'  # top right
-square_b = cross(rows, cols, id_var)
-unitlist_b = ([cross(rows, c, id_var) for c in cols] +
-              [cross(r, cols, id_var) for r in rows] +
-              [cross(rs, cs, id_var) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')])
-
-id_var = 'c'  # bottom left
-square_c = cross(rows, cols, id_var)
-unitlist_c = ([cross(rows, c, id_var) for c in cols] +
-              [cross(r, cols, id_var) for r in rows] +
-              [cross(rs, cs, id_var) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')])
-
-id_var = 'd'  # bottom right
-square_d = cross(rows, cols, id_var)
-unitlist_d = ([cross(rows, c, id_var) for c in cols] +
-              [cross(r, cols, id_var) for r in rows] +
-              [cross(rs, cs, id_var) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')])
-
-
-def repl(c):
-    a = b = 0
-    s = ""
-    if c[0] in 'ABCGHI' and c[1] in '123789':
-        if c[0] in 'ABC':
-            s += chr(ord(c[0]) + 6)
-            a = 1
-        elif c[0] in 'GHI':
-            s += chr(ord(c[0]) - 6)
-            a = 2
-        if c[1] in '123':
-            s += chr(ord(c[1]) + 6)
-            b = 1
-        elif c[1] in '789':
-            s += chr(ord(c[1]) - 6)
-            b = 2
-    else:
-        return c
-    if a == 1 and b == 1:
-        s += 'a'
-    elif a == 1 and b == 2:
-        s += 'b'
-    elif a == 2 and b == 1:
-        s += 'c'
-    elif a == 2 and b == 2:
-        s += 'd'
-    return s
-
-
-id_var = '+'
-square_mid = [repl(x) for x in cross(rows, cols, id_var)]
-unitlist_mid = ([square_mid[x * 9:x * 9 + 9] for x in range(0, 9)] +
-                [square_mid[x::9] for x in range(0, 9)] +
-                [cross(rs, cs, id_var) for rs in ('ABC', 'DEF', 'GHI')
-                 for cs in ('123', '456', '789')
-                 if not (rs in 'ABCGHI' and cs in '123789')])
-
-all_squares = set(square_a + square_b + square_c + square_d + square_mid)
+# Squares and units of each sudoku grid, from the compiled samurai topology.
+# A cell shared by a corner and the middle grid carries the corner's name.
+layout = SAMURAI
+squares = layout.names
+square_a, square_b, square_c, square_d, square_mid = [[squares[i] for i in cells] for cells in layout.grids]
+unitlist_a, unitlist_b, unitlist_c, unitlist_d, unitlist_mid = [[[squares[i] for i in u] for u in units]
+                                                                for units in layout.grid_units]
+
+all_squares = set(squares)
 all_unitlists = unitlist_a + unitlist_b + unitlist_c + unitlist_d + unitlist_mid
 
+square_index = layout.tables.index
+tables = layout.tables
+
+# Cell indices of each 9x9 grid (a, b, c, d, mid) and of the four boxes the middle grid shares
+subgrid_indices = layout.grids
+overlap_indices = [shared for k, j, shared in layout.overlaps]
+# Top left corner of each grid in the 21x21 text layout
+subgrid_offsets = layout.offsets
+
 
 def grid_values(grid):
     "Convert grid into a dict of {square: char} with '0' or '.' for empties."
-    a = [x[:9] for x in grid[:9]]
-    b = [x[12:] for x in grid[:9]]
-    c = [x[:9] for x in grid[12:]]
-    d = [x[12:] for x in grid[12:]]
-    mid = [x[6:15] for x in grid[6:15]]
-
-    chars = ([item for sublist in a for item in sublist] +
-             [item for sublist in b for item in sublist] +
-             [item for sublist in c for item in sublist] +
-             [item for sublist in d for item in sublist] +
-             [item for sublist in mid for item in sublist])
-
     sqrs = square_a + square_b + square_c + square_d + square_mid
-    assert len(chars) == 405
+    chars = [grid[row + n // 9][col + n % 9] for row, col in subgrid_offsets for n in range(81)]
     return dict(zip(sqrs, chars))
 
 
-def solve(grid):
-    """Solve the Samurai Sudoku using OR-Tools CP-SAT solver."""
-    model = cp_model.CpModel()
+def clue_vector(grid):
+    """Convert grid into a list of clue digits in `squares` order, 0 for empties.
+
+    grid may be the 21-line layout, a SamuraiGrid, or a 369-character string
+    in `squares` order.
+    """
+    if isinstance(grid, SamuraiGrid):
+        return list(grid.cells)
+    if isinstance(grid, str):
+        return list(SamuraiGrid.from_string(grid).cells)
+    return layout.parse(grid)
+
 
-    # Create variables
-    cell_vars = {}
-    for s in all_squares:
-        cell_vars[s] = model.NewIntVar(1, 9, s)
+# Byte translations between cell values 0-9 and the characters '0'-'9' ('.' reads as 0)
+_to_text = bytes(range(48, 58)) + bytes(246)
+_from_text = bytes([255] * 46) + b'\x00\xff' + bytes(range(10)) + bytes([255] * 198)
 
-    # Add constraints for all units
-    for unit in all_unitlists:
-        model.AddAllDifferent([cell_vars[s] for s in unit])
 
-    # Add initial values from the grid
-    grid_vals = grid_values(grid)
-    for s, val in grid_vals.items():
-        if val in digits:
-            model.Add(cell_vars[s] == int(val))
+class SamuraiGrid(Mapping):
+    """Samurai grid stored as one byte per cell in `squares` order, 0 for empty.
 
-    # Solve
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
+    Reads like the {square: char} dicts used elsewhere, so display() and
+    checker() accept it unchanged, at a fraction of the memory.
+    """
+    __slots__ = ('cells',)
 
-    # Extract solution if found
+    def __init__(self, cells=None):
+        self.cells = bytearray(len(squares)) if cells is None else bytearray(cells)
+        assert len(self.cells) == len(squares)
+
+    @classmethod
+    def from_grid(cls, grid):
+        """Parse the 21-line text layout."""
+        return cls(clue_vector(grid))
+
+    @classmethod
+    def from_string(cls, text):
+        """Parse 369 characters in `squares` order, '0' or '.' for empties."""
+        if len(text) != len(squares):
+            raise ValueError("Expected %d characters, got %d" % (len(squares), len(text)))
+        cells = text.encode('ascii').translate(_from_text)
+        if max(cells) > 9:
+            raise ValueError("Only digits and '.' are allowed in a puzzle string")
+        return cls(cells)
+
+    def to_string(self):
+        """Return the 369 characters in `squares` order, '0' for empties."""
+        return self.cells.translate(_to_text).decode('ascii')
+
+    def __getitem__(self, s):
+        return str(self.cells[square_index[s]])
+
+    def __iter__(self):
+        return iter(squares)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, s):
+        return s in square_index
+
+    def __eq__(self, other):
+        if isinstance(other, SamuraiGrid):
+            return self.cells == other.cells
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'SamuraiGrid(%r)' % bytes(self.cells)
+
+    def subgrid(self, k):
+        """Return the 81 digits of grid k (0-3 corners a-d, 4 middle) in row order."""
+        cells = self.cells
+        return bytes(cells[i] for i in subgrid_indices[k])
+
+    def overlap(self, k):
+        """Return the 9 digits of the box corner grid k shares with the middle grid."""
+        cells = self.cells
+        return bytes(cells[i] for i in overlap_indices[k])
+
+    def lines(self):
+        """Return the 21-line text layout read by grid_values, '0' for empties."""
+        return layout.render(self.cells)
+
+
+class TimeoutException(Exception):
+    """Raised when a solve hits its time limit before proving a result."""
+    pass
+
+
+class SamuraiSolver:
+    """CP-SAT model of the samurai structure, built once and reused for every puzzle."""
+
+    def __init__(self):
+        global cp_model
+        from ortools.sat.python import cp_model
+        self.model = cp_model.CpModel()
+
+        # Create variables, indexed like `squares`
+        self.cell_vars = [self.model.NewIntVar(1, 9, s) for s in squares]
+
+        # Add constraints for all units
+        for unit in all_unitlists:
+            self.model.AddAllDifferent([self.cell_vars[square_index[s]] for s in unit])
+
+    def clued_model(self, grid):
+        """Return a copy of the template with the clue domains of grid fixed."""
+        model = self.model.Clone()
+        variables = model.Proto().variables
+        for i, d in enumerate(clue_vector(grid)):
+            if d:
+                domain = variables[i].domain
+                domain[0] = domain[1] = d
+        return model
+
+    def solve(self, grid, timeout=None, config=DEFAULT):
+        """Solve one puzzle on a copy of the template, fixing only the clue domains.
+
+        timeout (seconds) is enforced inside CP-SAT, so the search stops and
+        frees its cores when it expires; TimeoutException is raised then.
+        config is a config.SolverConfig.
+        """
+        return self.solve_model(self.clued_model(grid), timeout, config=config)
+
+    def candidate_model(self, cands, hint=None):
+        """Return a copy of the template with each cell limited to its candidate mask.
+
+        hint, a list of digits such as an earlier solution, is passed to CP-SAT
+        as a solution hint.
+        """
+        model = self.model.Clone()
+        variables = model.Proto().variables
+        for i, m in enumerate(cands):
+            if m != bitmask.ALL:
+                domain = variables[i].domain
+                domain.clear()
+                domain.extend(_domains[m])
+        if hint:
+            for var, d in zip(self.cell_vars, hint):
+                model.AddHint(var, d)
+        return model
+
+    def reduced_model(self, cands):
+        """Return a model of only the unsolved cells of cands, and a function to expand its solutions.
+
+        Each open cell gets its candidate mask as domain and every unit an
+        AllDifferent over its open cells; solved cells are left out, since
+        propagation has already removed their digits from their peers. The
+        expand function turns a solution of the model into all 369 digits.
+        """
+        model = cp_model.CpModel()
+        known = [bitmask.bit_value.get(m, 0) for m in cands]
+        open_cells = [i for i, d in enumerate(known) if not d]
+        cell_vars = {}
+        for i in open_cells:
+            cell_vars[i] = model.NewIntVarFromDomain(
+                cp_model.Domain.FromFlatIntervals(_domains[cands[i]]), squares[i])
+        for unit in tables.units:
+            unit_vars = [cell_vars[i] for i in unit if i in cell_vars]
+            if len(unit_vars) > 1:
+                model.AddAllDifferent(unit_vars)
+
+        def expand(solution):
+            values = known[:]
+            for i, d in zip(open_cells, solution):
+                values[i] = d
+            return values
+
+        return model, expand
+
+    def solve_model(self, model, timeout=None, stats=None, config=DEFAULT, expand=None):
+        """Run CP-SAT on a model returned by clued_model or reduced_model.
+
+        stats, if given, is a stats.SolveStats that gets the solver's counters
+        and its presolve and search times. The split between the two is read
+        off the solver log, which is only turned on for this. expand is the
+        function reduced_model returns with its model.
+        """
+        solver = cp_model.CpSolver()
+        config.apply(solver.parameters, timeout)
+        if stats is not None:
+            phases = {}
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = lambda line: _log_phase(phases, line)
+            start = time.perf_counter()
+        status = solver.Solve(model)
+        if stats is not None:
+            end = time.perf_counter()
+            presolved = phases.get('search', end)
+            stats.build_time += phases.get('presolve', start) - start
+            stats.presolve_time += presolved - phases.get('presolve', start)
+            stats.search_time += end - presolved
+            _count_search(solver, stats)
+        return _result(solver, status, config.time_limit(timeout), expand)
+
+    def race(self, grid, engine, timeout=None, config=DEFAULT, stats=None):
+        """Race CP-SAT, on a thread of its own, against a native engine on this one.
+
+        Whichever settles the puzzle first stops the other; CP-SAT runs
+        outside the GIL, so the two really do run at the same time. Raise
+        ValueError for an unknown engine before either starts.
+        """
+        if engine not in NATIVE_ENGINES:
+            raise ValueError("Unknown engine to race: %r" % engine)
+        timeout = config.time_limit(timeout)
+        start = time.perf_counter()
+        model = self.clued_model(grid)
+        solver = cp_model.CpSolver()
+        config.apply(solver.parameters, timeout)
+        deadline = StopDeadline(timeout)
+        from concurrent.futures import ThreadPoolExecutor
+        if stats is not None:
+            stats.build_time += time.perf_counter() - start
+        with ThreadPoolExecutor(1) as pool:
+            future = pool.submit(solver.Solve, model)
+            future.add_done_callback(lambda f: deadline.stop())
+            try:
+                values = _native(engine, clue_vector(grid), deadline, stats)
+            finally:
+                solver.StopSearch()
+            status = future.result()
+        if stats is not None:
+            _count_search(solver, stats)
+        if values is not None:
+            return SamuraiGrid(values) if values else False
+        return _result(solver, status, timeout)
+
+    def count_solutions(self, grid, limit=2, timeout=None, config=DEFAULT):
+        """Count solutions of grid, stopping the search once limit are found."""
+        model = self.clued_model(grid)
+        solver = cp_model.CpSolver()
+        config.apply(solver.parameters, timeout)
+        timeout = config.time_limit(timeout)
+        solver.parameters.enumerate_all_solutions = True
+        counter = solution_counter(limit)
+        status = solver.Solve(model, counter)
+        # Only OPTIMAL (every solution enumerated) and INFEASIBLE settle a
+        # count short of limit; FEASIBLE means the time ran out after some
+        if counter.count < limit and status not in (cp_model.OPTIMAL, cp_model.INFEASIBLE):
+            raise TimeoutException("No result within %s seconds" % timeout)
+        return counter.count
+
+
+def solution_counter(limit):
+    """Return a CP-SAT callback that counts solutions and stops the search at limit."""
+
+    class SolutionCounter(cp_model.CpSolverSolutionCallback):
+        def __init__(self):
+            cp_model.CpSolverSolutionCallback.__init__(self)
+            self.limit = limit
+            self.count = 0
+
+        def on_solution_callback(self):
+            self.count += 1
+            if self.count >= self.limit:
+                self.StopSearch()
+
+    return SolutionCounter()
+
+
+def _result(solver, status, timeout, expand=None):
+    """Turn a finished CP-SAT run into a SamuraiGrid or False."""
     if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
-        solution = {}
-        for s in all_squares:
-            solution[s] = str(solver.Value(cell_vars[s]))
-        return solution
+        solution = solver.ResponseProto().solution
+        return SamuraiGrid(expand(solution) if expand else solution)
+    if status == cp_model.UNKNOWN:
+        raise TimeoutException("No result within %s seconds" % timeout)
     return False
 
 
+def _count_search(solver, stats):
+    """Add the search counters of a finished CP-SAT run to stats."""
+    response = solver.ResponseProto()
+    stats.branches += response.num_branches
+    stats.conflicts += response.num_conflicts
+    stats.propagations += response.num_binary_propagations + response.num_integer_propagations
+
+
+class StopDeadline:
+    """A time.monotonic() deadline that stop() can also end early.
+
+    The native searches test `time.monotonic() > deadline`, which Python
+    answers through __lt__ here.
+    """
+
+    def __init__(self, timeout=None):
+        self.at = None if timeout is None else time.monotonic() + timeout
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def __lt__(self, now):
+        return self.stopped or (self.at is not None and now > self.at)
+
+
+def _log_phase(phases, line):
+    """Note when CP-SAT logs the start of its presolve and of its search."""
+    if line.startswith('Starting presolve'):
+        phases['presolve'] = time.perf_counter()
+    elif line.startswith('Starting search'):
+        phases['search'] = time.perf_counter()
+
+
+def mask_domain(m):
+    """Return the CP-SAT domain of candidate mask m as flattened [lo, hi] intervals."""
+    domain = []
+    for d in map(int, bitmask.mask_digits[m]):
+        if domain and domain[-1] == d - 1:
+            domain[-1] = d
+        else:
+            domain += [d, d]
+    return domain
+
+
+_domains = [mask_domain(m) for m in range(bitmask.ALL + 1)]
+
+_solver = None
+_dlx_matrix = None
+
+
+def get_solver():
+    """Return the shared SamuraiSolver, building its model on first use."""
+    global _solver
+    if _solver is None:
+        _solver = SamuraiSolver()
+    return _solver
+
+
+def solve(grid, engine='cpsat', timeout=None, stats=False, config=DEFAULT):
+    """Solve the Samurai Sudoku.
+
+    engine is 'cpsat' for the OR-Tools CP-SAT model, 'bitmask' for native
+    propagation with MRV search, 'dlx' for exact cover, or 'decompose' to
+    branch only on the shared boxes and solve each grid separately (see
+    decompose.py). The native engines have no setup cost, which dominates on
+    easy puzzles.
+
+    Return the solution dict, or False if the puzzle has no solution. Raise
+    TimeoutException if timeout seconds pass before either is known.
+
+    With stats=True, return (solution, SolveStats) instead; the stats of a
+    timed out solve are on the exception's stats attribute. Hooks added with
+    stats.add_stats_hook see the SolveStats of every solve.
+
+    config, a config.SolverConfig, sets the CP-SAT parameters, a default time
+    limit, and whether CP-SAT races a native engine (its portfolio option).
+    """
+    timeout = config.time_limit(timeout)
+    if not stats and not hooks_active():
+        return _solve(grid, engine, timeout, config=config)
+    record = SolveStats(engine)
+    try:
+        result = _solve(grid, engine, timeout, record, config)
+    except TimeoutException as e:
+        record.outcome = 'timeout'
+        e.stats = record
+        emit(record)
+        raise
+    record.outcome = 'solved' if result else 'unsolvable'
+    emit(record)
+    return (result, record) if stats else result
+
+
+def _solve(grid, engine, timeout, stats=None, config=DEFAULT):
+    """Solve grid with engine, timing each phase into stats if given.
+
+    Clues that contradict each other outright are answered False before any
+    solver work.
+    """
+    start = time.perf_counter()
+    grid = SamuraiGrid(clue_vector(grid))
+    invalid = validate.check(grid.cells)
+    if stats is not None:
+        stats.parse_time += time.perf_counter() - start
+    if invalid is not None:
+        return False
+    if engine == 'cpsat':
+        if config.propagate:
+            return _solve_propagated(grid, timeout, stats, config)
+        if config.portfolio:
+            return get_solver().race(grid, config.portfolio, timeout, config, stats)
+        if stats is None:
+            return get_solver().solve(grid, timeout, config)
+        start = time.perf_counter()
+        model = get_solver().clued_model(grid)
+        stats.build_time += time.perf_counter() - start
+        return get_solver().solve_model(model, timeout, stats, config)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    values = _native(engine, clue_vector(grid), deadline, stats)
+    if values is None:
+        raise TimeoutException("No result within %s seconds" % timeout)
+    if not values:
+        return False
+    return SamuraiGrid(values)
+
+
+def _solve_propagated(grid, timeout, stats=None, config=DEFAULT):
+    """Propagate natively, then hand CP-SAT only the cells left open, if any.
+
+    A puzzle that propagation settles, solved or contradictory, never loads
+    OR-Tools.
+    """
+    start = time.perf_counter()
+    cands = bitmask.presolve(clue_vector(grid), tables)
+    if stats is not None:
+        stats.presolve_time += time.perf_counter() - start
+    if cands is False:
+        return False
+    if all(bitmask.popcount[m] == 1 for m in cands):
+        return SamuraiGrid([bitmask.bit_value[m] for m in cands])
+    if config.portfolio:
+        return get_solver().race(grid, config.portfolio, timeout, config, stats)
+    start = time.perf_counter()
+    model, expand = get_solver().reduced_model(cands)
+    if stats is not None:
+        stats.build_time += time.perf_counter() - start
+    return get_solver().solve_model(model, timeout, stats, config, expand)
+
+
+NATIVE_ENGINES = ('bitmask', 'dlx', 'decompose')
+
+
+def _native(engine, clues, deadline, stats=None):
+    """Run a native engine on clue digits; return the solution digits, False, or None."""
+    global _dlx_matrix
+    if engine == 'bitmask':
+        return bitmask.solve(clues, tables, deadline, stats)
+    elif engine == 'dlx':
+        if _dlx_matrix is None:
+            start = time.perf_counter()
+            rows = dlx.build_rows(tables)
+            _dlx_matrix = rows, dlx.build_columns(rows)
+            if stats is not None:
+                stats.build_time += time.perf_counter() - start
+        return dlx.solve(clues, tables, *_dlx_matrix, deadline=deadline, stats=stats)
+    elif engine == 'decompose':
+        import decompose
+        return decompose.solve(clues, deadline=deadline, stats=stats)
+    raise ValueError("Unknown engine: %r" % engine)
+
+
+def count_solutions(grid, limit=2, engine='cpsat', timeout=None, config=DEFAULT):
+    """Return the number of solutions of grid, counting no further than limit.
+
+    engine is 'cpsat' or 'bitmask'. Raise TimeoutException if timeout seconds
+    pass before the count is settled.
+    """
+    timeout = config.time_limit(timeout)
+    if engine == 'cpsat':
+        return get_solver().count_solutions(grid, limit, timeout, config)
+    if engine != 'bitmask':
+        raise ValueError("Unknown engine for counting: %r" % engine)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    count = bitmask.count_solutions(bitmask.initial_candidates(clue_vector(grid), tables),
+                                    tables, limit, deadline)
+    if count is None:
+        raise TimeoutException("No result within %s seconds" % timeout)
+    return count
+
+
+def is_unique(grid, engine='cpsat', timeout=None, config=DEFAULT):
+    """A puzzle is unique if it has exactly one solution."""
+    return count_solutions(grid, 2, engine, timeout, config) == 1
+
+
+################ Batch solving ################
+
+def init_worker(engine):
+    """Warm up a pool worker so its first puzzle does not pay for model construction.
+
+    Pass it as the initializer of any process pool that runs solve_chunk.
+    """
+    if engine == 'cpsat':
+        get_solver()
+
+
+def solve_chunk(chunk, engine, timeout, config=BATCH):
+    """Solve a list of (index, grid) pairs inside a worker.
+
+    Return (index, solution, stats dict) for each; solution is None when
+    the solve timed out. This is the unit of work solve_many submits.
+    """
+    results = []
+    for index, grid in chunk:
+        start = time.time()
+        try:
+            values, record = solve(grid, engine, timeout, stats=True, config=config)
+        except TimeoutException as e:
+            values, record = None, e.stats
+        summary = record.as_dict()
+        summary['time'] = time.time() - start
+        results.append((index, values, summary))
+    return results
+
+
+def solve_many(grids, workers=None, chunksize=1, engine='cpsat', max_pending=None, timeout=None,
+               config=BATCH):
+    """Solve grids on a process pool, yielding (index, solution, stats) as results finish.
+
+    grids may be any iterable and is consumed lazily: at most max_pending
+    chunks (default two per worker) are in flight at a time, so memory stays
+    bounded however long the input is. Results arrive in completion order.
+    The solution is False for an unsolvable puzzle and None for a timeout;
+    stats is SolveStats.as_dict() plus the wall time of the solve. Stats hooks
+    run in the worker processes, not in the caller.
+
+    config defaults to config.BATCH, one CP-SAT worker per puzzle, since the
+    pool already runs a puzzle per process.
+    """
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    items = enumerate(grids)
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(engine,)) as pool:
+        pending = set()
+        while True:
+            chunk = list(islice(items, chunksize))
+            if chunk:
+                pending.add(pool.submit(solve_chunk, chunk, engine, timeout, config))
+            if not pending:
+                break
+            if chunk and len(pending) < max_pending:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
 def display(values, sqr):
     """Display sudoku in a 2-D grid."""
     if not values:
@@ -166,15 +620,18 @@ def display_samurai(vals):
 
 
 if __name__ == '__main__':
+    txt = sys.argv[1] if len(sys.argv) > 1 else None
     while True:
         try:
-            txt = input("Insert file path containing the Samurai Sudoku: ")
+            if txt is None:
+                txt = input("Insert file path containing the Samurai Sudoku: ")
             with open(txt, 'r') as f:
                 samurai_grid = [line.strip() for line in f if line.strip()]
                 break
         except FileNotFoundError:
             print(f"File not found: {txt}")
             print("Example test cases can be found in the 'tests' directory")
+            txt = None
 
     ans = solve(samurai_grid)
-    display_samurai(ans)
\ No newline at end of file
+    display_samurai(ans)
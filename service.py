@@ -0,0 +1,202 @@
+## Asyncio solving service over a pool of warm solver processes
+##
+##     solution = await solve_async(grid, timeout=5)
+##
+## Puzzles are solved in worker processes that build their CP-SAT model once
+## at start-up, so the event loop never runs a search itself. At most one
+## puzzle per worker is in flight; further requests wait their turn, and once
+## max_queue are waiting new ones are refused with ServiceBusy rather than
+## piling up. A request's timeout covers its wait as well as its solve.
+##
+## To run the HTTP/JSON server:
+##     python service.py --port 8080 --workers 8
+##
+##     POST /solve   {"puzzle": <369 characters, 405 (every grid in full) or the
+##                               21 layout lines>,
+##                    "timeout": seconds, "engine": name}  (all but puzzle optional)
+##                   -> {"status": "solved" | "unsolvable" | "timeout",
+##                       "solution": <369 characters>, "stats": {...}}
+##                   Contradictory clues are answered at once, with a "reason"
+##                   from validate.py in place of the stats.
+##                   A timeout that is not a non-negative number is a 400.
+##     GET /health   -> {"workers": n, "running": n, "waiting": n}
+
+import os
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import samurai
+import validate
+from samurai import SamuraiGrid, TimeoutException
+from config import BATCH
+
+
+class ServiceBusy(Exception):
+    """Raised when too many requests are already waiting for a worker."""
+    pass
+
+
+class SolverPool:
+    """A bounded process pool of warm solvers for use from asyncio."""
+
+    def __init__(self, workers=None, engine='cpsat', max_queue=None, config=BATCH):
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine
+        self.max_queue = 64 * self.workers if max_queue is None else max_queue
+        self.config = config
+        self.pool = ProcessPoolExecutor(self.workers, initializer=samurai.init_worker,
+                                        initargs=(engine,))
+        self.slots = asyncio.Semaphore(self.workers)
+        self.accepted = self.running = 0
+
+    @property
+    def waiting(self):
+        """Requests accepted but not yet handed to a worker."""
+        return self.accepted - self.running
+
+    async def solve(self, grid, timeout=None, engine=None, stats=False):
+        """Solve grid in a worker; return the SamuraiGrid or False.
+
+        Raise TimeoutException if timeout seconds pass, counting the time spent
+        waiting for a worker, and ServiceBusy if the queue is full. With
+        stats=True return (solution, stats dict) as samurai.solve_many does.
+        """
+        timeout = self.config.time_limit(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        grid = SamuraiGrid(samurai.clue_vector(grid))
+        if self.accepted >= self.workers + self.max_queue:
+            raise ServiceBusy("%d requests already waiting" % self.max_queue)
+
+        self.accepted += 1
+        try:
+            try:
+                await asyncio.wait_for(self.slots.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutException("No worker free within %s seconds" % timeout)
+            self.running += 1
+            try:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                loop = asyncio.get_running_loop()
+                [(index, solution, summary)] = await loop.run_in_executor(
+                    self.pool, samurai.solve_chunk, [(0, grid)], engine or self.engine,
+                    remaining, self.config)
+            finally:
+                self.running -= 1
+                self.slots.release()
+        finally:
+            self.accepted -= 1
+        if solution is None:
+            raise TimeoutException("No result within %s seconds" % timeout)
+        return (solution, summary) if stats else solution
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+_pool = None
+
+
+async def solve_async(grid, timeout=None, engine=None):
+    """Solve grid on the shared SolverPool, started on first use."""
+    global _pool
+    if _pool is None:
+        _pool = SolverPool()
+    return await _pool.solve(grid, timeout, engine)
+
+
+################ HTTP/JSON server ################
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error',
+               503: 'Service Unavailable'}
+
+
+async def handle_request(pool, method, path, body):
+    """Answer one request; return (HTTP status, JSON-able dict)."""
+    if method == 'GET' and path == '/health':
+        return 200, {'workers': pool.workers, 'running': pool.running, 'waiting': pool.waiting}
+    if method != 'POST' or path != '/solve':
+        return 404, {'error': 'not found'}
+    try:
+        request = json.loads(body)
+        puzzle = request['puzzle']
+        timeout = request.get('timeout')
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+                                    or not timeout >= 0):
+            raise ValueError("timeout must be a non-negative number of seconds, got %r" % (timeout,))
+        engine = request.get('engine')
+        if engine not in (None, 'cpsat', 'bitmask', 'dlx', 'decompose'):
+            raise ValueError("Unknown engine: %r" % engine)
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        return 400, {'error': str(e) or 'bad request'}
+    # Bad input is answered here and never takes a worker
+    clues = validate.read(puzzle)
+    if isinstance(clues, validate.Invalid):
+        return 400, {'error': clues.message, 'reason': clues._asdict()}
+    invalid = validate.check(clues)
+    if invalid is not None:
+        return 200, {'status': 'unsolvable', 'reason': invalid._asdict()}
+    grid = SamuraiGrid(clues)
+    try:
+        solution, summary = await pool.solve(grid, timeout, engine, stats=True)
+    except TimeoutException:
+        return 200, {'status': 'timeout'}
+    except ServiceBusy as e:
+        return 503, {'error': str(e)}
+    if not solution:
+        return 200, {'status': 'unsolvable', 'stats': summary}
+    return 200, {'status': 'solved', 'solution': solution.to_string(), 'stats': summary}
+
+
+async def handle_connection(pool, reader, writer):
+    """Serve one HTTP/1.1 request per connection."""
+    try:
+        method, path, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+        length = 0
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        body = await reader.readexactly(length) if length else b''
+        status, reply = await handle_request(pool, method, path, body)
+    except (ValueError, asyncio.IncompleteReadError):
+        status, reply = 400, {'error': 'malformed request'}
+    except Exception as e:
+        status, reply = 500, {'error': '%s: %s' % (type(e).__name__, e)}
+    data = json.dumps(reply).encode()
+    writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                  'Connection: close\r\n\r\n' % (status, STATUS_TEXT[status], len(data))).encode() + data)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(host='127.0.0.1', port=8080, workers=None, engine='cpsat', max_queue=None):
+    """Run the HTTP server until cancelled."""
+    pool = SolverPool(workers, engine, max_queue)
+    server = await asyncio.start_server(lambda r, w: handle_connection(pool, r, w), host, port)
+    print('Serving on http://%s:%d with %d workers' % (host, port, pool.workers))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve samurai solving over HTTP/JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--engine', default='cpsat', choices=['cpsat', 'bitmask', 'dlx', 'decompose'])
+    parser.add_argument('--max-queue', type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.engine, args.max_queue))
+    except KeyboardInterrupt:
+        pass
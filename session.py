@@ -0,0 +1,118 @@
+## Incremental solving for interactive play
+##
+## A SamuraiSession keeps the propagated candidates of one board. Placing a
+## digit only re-propagates from that cell through the worklist, and every
+## change is written to a trail so undo() restores the previous state exactly
+## instead of recomputing it. The last solution found is kept and reused for
+## as long as it agrees with the board, so most solvability checks and hints
+## need no search at all.
+
+import time
+import bitmask
+import samurai
+from bitmask import popcount, bit_value
+from samurai import squares, square_index, tables, clue_vector, SamuraiGrid, TimeoutException
+
+
+class SamuraiSession:
+    """One board that digits are placed on and undone one move at a time."""
+
+    def __init__(self, grid, engine='bitmask'):
+        """Start from the clues of grid; engine ('bitmask' or 'cpsat') runs any search."""
+        self.engine = engine
+        self.clues = clue_vector(grid)
+        self.placed = {}
+        self.moves = []
+        self.trail = []
+        self.solution = None
+        cands = bitmask.initial_candidates(self.clues, tables)
+        self.broken = cands is False
+        self.cands = [bitmask.ALL] * len(squares) if self.broken else cands
+
+    def place(self, cell, d):
+        """Place digit d in cell (a square name or index).
+
+        Return False if propagation shows the board can no longer be
+        completed. The move is kept either way, so it can be undone. Raise
+        ValueError if d is not a digit 1-9 or the cell is already filled.
+        """
+        if isinstance(d, bool) or not isinstance(d, int) or not 1 <= d <= 9:
+            raise ValueError("Digit must be 1-9, got %r" % (d,))
+        i = square_index[cell] if isinstance(cell, str) else cell
+        if self.clues[i] or i in self.placed:
+            raise ValueError("Cell %s is already filled" % squares[i])
+        self.moves.append((i, len(self.trail), self.broken))
+        self.placed[i] = d
+        if not self.broken:
+            self.broken = bitmask.assign(self.cands, i, d, tables, self.trail) is False
+        return not self.broken
+
+    def undo(self):
+        """Take back the last placed digit; return its (square, digit)."""
+        i, mark, broken = self.moves.pop()
+        bitmask.undo(self.cands, self.trail, mark)
+        self.broken = broken
+        d = self.placed.pop(i)
+        if self.solution is False:
+            self.solution = None
+        return squares[i], d
+
+    def agrees(self, solution):
+        """True if solution is still possible given the current candidates."""
+        cands = self.cands
+        return all(cands[i] >> (d - 1) & 1 for i, d in enumerate(solution))
+
+    def solve(self, timeout=None):
+        """Return a solution of the current board as a list of digits, or False."""
+        if self.broken:
+            return False
+        if self.solution and self.agrees(self.solution):
+            return self.solution
+        if self.solution is False:
+            return False
+        if self.engine == 'cpsat':
+            result = samurai.get_solver().solve_model(
+                samurai.get_solver().candidate_model(self.cands, self.solution), timeout)
+            self.solution = list(result.cells) if result else False
+        else:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            result = bitmask.search(self.cands[:], tables, deadline)
+            if result is None:
+                raise TimeoutException("No result within %s seconds" % timeout)
+            self.solution = [bit_value[m] for m in result] if result else False
+        return self.solution
+
+    def is_solvable(self, timeout=None):
+        """True if the board can still be completed."""
+        return bool(self.solve(timeout))
+
+    def hint(self, timeout=None):
+        """Return a (square, digit) to fill next, or None if the board is stuck.
+
+        A board with no solution gets no hint, even where propagation has
+        forced a digit. Otherwise forced cells come first, then the empty
+        cell with the fewest candidates, filled from a solution.
+        """
+        solution = self.solve(timeout)
+        if not solution:
+            return None
+        empty = [i for i, d in enumerate(self.clues) if not d and i not in self.placed]
+        for i in empty:
+            if popcount[self.cands[i]] == 1:
+                return squares[i], bit_value[self.cands[i]]
+        if not empty:
+            return None
+        i = min(empty, key=lambda i: popcount[self.cands[i]])
+        return squares[i], solution[i]
+
+    def board(self):
+        """Return the clues and placed digits as a SamuraiGrid."""
+        grid = SamuraiGrid(self.clues)
+        for i, d in self.placed.items():
+            grid.cells[i] = d
+        return grid
+
+    def candidates(self, cell):
+        """Return the digits still possible in cell as a string."""
+        i = square_index[cell] if isinstance(cell, str) else cell
+        return bitmask.mask_digits[self.cands[i]]
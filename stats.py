@@ -0,0 +1,96 @@
+## Per-solve statistics and hooks for exporting them
+##
+## samurai.solve(grid, stats=True) returns a SolveStats next to the solution.
+## Functions registered with add_stats_hook are called with the SolveStats of
+## every solve in this process, whether or not the caller asked for it, so a
+## metrics exporter can be attached without touching the calling code.
+##
+## Times are in seconds. The CP-SAT counters come from the solver response;
+## the search counters come from the native engines (bitmask, dlx):
+##   guesses           branch choices tried
+##   backtracks        times a failed choice was abandoned for a sibling
+##   backtrack_levels  guesses undone over all backtracks
+##   max_depth         most guesses open at once
+
+FIELDS = ('engine', 'outcome', 'parse_time', 'build_time', 'presolve_time', 'search_time',
+          'branches', 'conflicts', 'propagations',
+          'guesses', 'backtracks', 'backtrack_levels', 'max_depth')
+
+
+class SolveStats:
+    """Timings and search counters of one solve."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.outcome = None
+        self.parse_time = self.build_time = self.presolve_time = self.search_time = 0.0
+        self.branches = self.conflicts = self.propagations = 0
+        self.guesses = self.backtracks = self.backtrack_levels = self.max_depth = 0
+        self.depth = 0
+        self.dead_end = -1
+
+    @property
+    def total_time(self):
+        return self.parse_time + self.build_time + self.presolve_time + self.search_time
+
+    @property
+    def mean_backtrack(self):
+        """Average number of guesses undone per backtrack."""
+        return self.backtrack_levels / self.backtracks if self.backtracks else 0.0
+
+    # Called by the native searches; see the module comment for the meanings
+
+    def descend(self):
+        """A new branching node: one more guess is open."""
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def ascend(self):
+        """Every choice at the current node failed."""
+        self.depth -= 1
+
+    def guess(self):
+        """A choice is tried at the current node, after any failed siblings."""
+        self.guesses += 1
+        if self.dead_end >= 0:
+            self.backtracks += 1
+            self.backtrack_levels += self.dead_end - self.depth + 1
+            self.dead_end = -1
+
+    def fail(self):
+        """The current choice led to a contradiction."""
+        self.dead_end = self.depth
+
+    def as_dict(self):
+        d = dict((f, getattr(self, f)) for f in FIELDS)
+        d['total_time'] = self.total_time
+        d['mean_backtrack'] = self.mean_backtrack
+        return d
+
+    def __repr__(self):
+        return 'SolveStats(%s)' % ', '.join('%s=%r' % (f, getattr(self, f)) for f in FIELDS)
+
+
+################ Hooks ################
+
+_hooks = []
+
+
+def add_stats_hook(hook):
+    """Call hook(stats) with the SolveStats of every solve from now on."""
+    _hooks.append(hook)
+
+
+def remove_stats_hook(hook):
+    _hooks.remove(hook)
+
+
+def hooks_active():
+    return bool(_hooks)
+
+
+def emit(stats):
+    """Pass stats to every registered hook."""
+    for hook in _hooks:
+        hook(stats)
@@ -1,6 +1,6 @@
 ## Solve Every Sudoku Puzzle with OR-Tools
 
-from ortools.sat.python import cp_model
+from config import DEFAULT
 
 
 def cross(A, B):
@@ -61,8 +61,16 @@ def display(values):
 
 ################ OR-Tools Solver ################
 
-def solve(grid):
-    """Solve the Sudoku puzzle using OR-Tools CP-SAT solver."""
+def solve(grid, config=DEFAULT):
+    """Solve the Sudoku puzzle using OR-Tools CP-SAT solver.
+
+    config is a config.SolverConfig; its portfolio option has no native
+    engine to race here and is ignored. Raise samurai.TimeoutException if
+    the config's time limit passes before a result is known.
+    """
+    from ortools.sat.python import cp_model
+    from samurai import TimeoutException
+
     # Create the model
     model = cp_model.CpModel()
 
@@ -84,6 +92,7 @@ def solve(grid):
 
     # Solve
     solver = cp_model.CpSolver()
+    config.apply(solver.parameters)
     status = solver.Solve(model)
 
     # Extract solution if found
@@ -92,6 +101,8 @@ def solve(grid):
         for s in squares:
             solution[s] = str(solver.Value(cell_vars[s]))
         return solution
+    if status == cp_model.UNKNOWN:
+        raise TimeoutException("No result within %s seconds" % config.time_limit())
     return False
 
 
@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import samurai
+from samurai import TimeoutException
+
+
+def fixture(name):
+    with open(os.path.join(HERE, name)) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+@pytest.mark.parametrize('engine', ['cpsat', 'bitmask'])
+def test_timeout_after_some_solutions_raises(engine):
+    # The empty grid has far more solutions than either engine can count in
+    # half a second, so a partial count must never come back as the answer
+    with pytest.raises(TimeoutException):
+        samurai.count_solutions(fixture('empty.txt'), 10 ** 6, engine, timeout=0.5)
+
+
+def test_unique_fixture_counts_one():
+    assert samurai.count_solutions(fixture('easy1.txt'), 2, timeout=30) == 1
@@ -0,0 +1,153 @@
+## Layouts of overlapping sudoku grids, compiled to integer index tables
+##
+## A topology is a list of 9x9 grids, each placed on a common board by the
+## (row, col) of its top left cell. Grids that cover the same board cells
+## share them; in the gattai family that is always whole 3x3 boxes. Compiling
+## a topology numbers every board cell once, in the order grids first cover
+## them (row by row within a grid), and lists each grid's cells and every
+## row, column and box as index tuples. The solvers, the checker and the
+## parser all work from these tables, so any layout below runs through the
+## same code as the samurai.
+##
+## Compiling takes a few milliseconds per layout, so the named layouts are
+## compiled on first use by get() and kept; only the plain sudoku and the
+## samurai are compiled at import.
+##
+## Cell names follow samurai.py: row letter, column digit, then the label of
+## the first grid covering the cell, e.g. 'A1a'.
+
+import bitmask
+
+rows = 'ABCDEFGHI'
+cols = '123456789'
+
+# Rows, columns and boxes of one 9x9 grid as indices into its 81 cells
+local_units = ([[r * 9 + c for c in range(9)] for r in range(9)] +
+               [[r * 9 + c for r in range(9)] for c in range(9)] +
+               [[(br + r) * 9 + bc + c for r in range(3) for c in range(3)]
+                for br in (0, 3, 6) for bc in (0, 3, 6)])
+
+
+class Topology:
+    """A set of 9x9 grids at (row, col) offsets, compiled once into index tables."""
+
+    def __init__(self, name, offsets, labels=None):
+        self.name = name
+        self.offsets = [tuple(offset) for offset in offsets]
+        self.labels = labels or 'abcdefghijklmnopqrstuvwxyz'[:len(self.offsets)]
+        self.height = max(row for row, col in self.offsets) + 9
+        self.width = max(col for row, col in self.offsets) + 9
+
+        # Board position of every cell, each shared cell once
+        self.positions = list(dict.fromkeys((row + n // 9, col + n % 9)
+                                            for row, col in self.offsets for n in range(81)))
+        self.index = dict((p, i) for i, p in enumerate(self.positions))
+        self.grids = [[self.index[(row + n // 9, col + n % 9)] for n in range(81)]
+                      for row, col in self.offsets]
+
+        names = [None] * len(self.positions)
+        for label, cells in reversed(list(zip(self.labels, self.grids))):
+            for n, i in enumerate(cells):
+                names[i] = rows[n // 9] + cols[n % 9] + label
+        self.names = names
+
+        # Rows, columns and boxes of every grid; a shared box is one unit
+        self.grid_units = []
+        seen = set()
+        for cells in self.grids:
+            units = []
+            for u in local_units:
+                unit = tuple(cells[n] for n in u)
+                if frozenset(unit) not in seen:
+                    seen.add(frozenset(unit))
+                    units.append(unit)
+            self.grid_units.append(units)
+        self.units = [u for units in self.grid_units for u in units]
+
+        # (grid k, grid j, shared cells in k's order) for every overlapping pair
+        self.overlaps = []
+        grid_sets = [set(cells) for cells in self.grids]
+        for k, cells in enumerate(self.grids):
+            for j in range(k + 1, len(self.grids)):
+                shared = [i for i in cells if i in grid_sets[j]]
+                if shared:
+                    self.overlaps.append((k, j, shared))
+
+        self.tables = bitmask.build_tables(names, [[names[i] for i in u] for u in self.units])
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __repr__(self):
+        return 'Topology(%r, %d grids, %d cells)' % (self.name, len(self.grids), len(self))
+
+    def local(self, k, i):
+        """Return where cell i sits within grid k, 0-80 in row order."""
+        row, col = self.positions[i]
+        top, left = self.offsets[k]
+        return (row - top) * 9 + col - left
+
+    def parse(self, lines):
+        """Return the clue digits of a board drawn as text lines, 0 for empties.
+
+        Each line is a board row; cells are read at their board position, so
+        the gaps between grids may hold any character. Raise ValueError on a
+        missing cell or a character other than a digit, '0' or '.'.
+        """
+        clues = []
+        for row, col in self.positions:
+            if row >= len(lines) or col >= len(lines[row]):
+                raise ValueError("%s board is missing cell (%d, %d)" % (self.name, row, col))
+            c = lines[row][col]
+            if c in '0.':
+                clues.append(0)
+            elif c in cols:
+                clues.append(int(c))
+            else:
+                raise ValueError("Unexpected %r at (%d, %d)" % (c, row, col))
+        return clues
+
+    def render(self, cells):
+        """Draw cell digits as board lines, '0' for empties and '.' between grids."""
+        board = [['.'] * self.width for _ in range(self.height)]
+        for (row, col), d in zip(self.positions, cells):
+            board[row][col] = str(d)
+        return [''.join(line) for line in board]
+
+    def solve(self, clues, deadline=None):
+        """Solve clue digits with the bitmask engine; return digits, False, or None on timeout."""
+        return bitmask.solve(clues, self.tables, deadline)
+
+
+def gattai_offsets(n):
+    """Return the grid offsets of the n-by-n gattai: corner grids 12 cells apart, bridged by middle grids.
+
+    n=2 is the samurai; n=3 is the 13-grid gattai.
+    """
+    corners = [(12 * r, 12 * c) for r in range(n) for c in range(n)]
+    middles = [(12 * r + 6, 12 * c + 6) for r in range(n - 1) for c in range(n - 1)]
+    return corners + middles
+
+
+# Named layouts as (offsets, labels); compiled on first use by get()
+LAYOUTS = {
+    'sudoku': ([(0, 0)], None),
+    'twin': ([(0, 0), (6, 6)], None),
+    'triple': ([(0, 0), (6, 6), (12, 12)], None),
+    'sohei': ([(0, 6), (6, 0), (6, 12), (12, 6)], None),
+    'samurai': ([(0, 0), (0, 12), (12, 0), (12, 12), (6, 6)], 'abcd+'),
+    'gattai-13': (gattai_offsets(3), None),
+}
+_compiled = {}
+
+
+def get(name):
+    """Return the compiled topology of a named layout, compiling it only once."""
+    if name not in _compiled:
+        offsets, labels = LAYOUTS[name]
+        _compiled[name] = Topology(name, offsets, labels)
+    return _compiled[name]
+
+
+SUDOKU = get('sudoku')
+SAMURAI = get('samurai')
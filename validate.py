@@ -0,0 +1,143 @@
+## Fast rejection of malformed and contradictory puzzles
+##
+## validate(grid) says why a puzzle cannot be solved without building a
+## model or searching: a bad character or length, a digit repeated in a
+## unit, an overlap box that disagrees between a corner and the middle grid
+## (only possible when each grid is given in full, 405 digits), or a cell
+## left with no candidate by its clued peers. It returns an Invalid naming
+## the cells involved, or None when the puzzle passes; a puzzle that passes
+## may still turn out unsolvable in the search.
+##
+## Any layout from topology.py can be checked; the samurai is the default.
+
+from collections import namedtuple
+from collections.abc import Mapping
+from bitmask import ALL, mask_digits
+from topology import SAMURAI
+
+# reason is 'format', 'duplicate', 'overlap', 'no_candidates' or 'no_place';
+# cells are cell names as in topology.names, digit is 0 when none applies
+Invalid = namedtuple('Invalid', 'reason cells digit message')
+
+_values = dict((c, int(c)) for c in '0123456789')
+_values['.'] = 0
+
+
+def read(grid, topology=SAMURAI):
+    """Return the clue digits of grid in topology order, or an Invalid.
+
+    grid may be the board text lines, a mapping of cell names to digits
+    (such as a SamuraiGrid), a string or sequence of digits with one per
+    cell, or one with every grid in full (81 per grid, in topology.grids
+    order), whose shared cells must then agree.
+    """
+    grid = getattr(grid, 'cells', grid)
+    try:
+        if isinstance(grid, Mapping):
+            return _read_mapping(grid, topology)
+        if isinstance(grid, (str, bytes, bytearray)) or (grid and isinstance(grid[0], int)):
+            if isinstance(grid, str):
+                grid = [_values[c] for c in grid]
+            if len(grid) == 81 * len(topology.grids) and len(topology.grids) > 1:
+                return _merge_grids(grid, topology)
+            if len(grid) != len(topology):
+                return Invalid('format', (), 0, "Expected %d or %d cells, got %d"
+                               % (len(topology), 81 * len(topology.grids), len(grid)))
+            if max(grid) > 9 or min(grid) < 0:
+                return Invalid('format', (), 0, "Cell values must be 0-9")
+            return list(grid)
+        return topology.parse(grid)
+    except KeyError as e:
+        return Invalid('format', (), 0, "Unexpected %r in puzzle" % e.args[0])
+    except (ValueError, TypeError, IndexError) as e:
+        return Invalid('format', (), 0, str(e) or 'malformed puzzle')
+
+
+def _read_mapping(grid, topology):
+    """Read a mapping of cell names to digits, naming any bad key or value."""
+    names = topology.names
+    unknown = [key for key in grid if key not in topology.tables.index]
+    if unknown:
+        return Invalid('format', (), 0, "Unknown cell name %r; expected names such as %r"
+                       % (unknown[0], names[0]))
+    missing = [s for s in names if s not in grid]
+    if missing:
+        return Invalid('format', tuple(missing), 0, "No value for cell %s%s"
+                       % (missing[0], " and %d more" % (len(missing) - 1) if len(missing) > 1 else ''))
+    clues = []
+    for s in names:
+        value = _values.get(str(grid[s]))
+        if value is None:
+            return Invalid('format', (s,), 0, "%s holds %r; expected a digit, '0' or '.'" % (s, grid[s]))
+        clues.append(value)
+    return clues
+
+
+def _merge_grids(values, topology):
+    """Fold 81 digits per grid into one per cell, checking the shared boxes agree."""
+    if max(values) > 9 or min(values) < 0:
+        return Invalid('format', (), 0, "Cell values must be 0-9")
+    clues = [0] * len(topology)
+    for k, cells in enumerate(topology.grids):
+        for n, i in enumerate(cells):
+            d = values[81 * k + n]
+            if d and clues[i] and clues[i] != d:
+                return Invalid('overlap', (topology.names[i],), d,
+                               "%s is %d in one grid and %d in another"
+                               % (topology.names[i], clues[i], d))
+            clues[i] = clues[i] or d
+    return clues
+
+
+def check(clues, topology=SAMURAI):
+    """Return an Invalid for clue digits that contradict each other, or None.
+
+    One sweep over the units: no digit twice in a unit, every empty cell
+    keeps a candidate, and every digit keeps a place in every unit.
+    """
+    names = topology.names
+    units, cell_units = topology.tables.units, topology.tables.cell_units
+    used = []
+    for u in units:
+        seen = 0
+        for i in u:
+            d = clues[i]
+            if d:
+                b = 1 << (d - 1)
+                if seen & b:
+                    first = next(j for j in u if clues[j] == d)
+                    return Invalid('duplicate', (names[first], names[i]), d,
+                                   "%d appears in both %s and %s" % (d, names[first], names[i]))
+                seen |= b
+        used.append(seen)
+
+    cands = [0] * len(clues)
+    for i, d in enumerate(clues):
+        if d:
+            cands[i] = 1 << (d - 1)
+            continue
+        m = ALL
+        for k in cell_units[i]:
+            m &= ~used[k]
+        if not m:
+            return Invalid('no_candidates', (names[i],), 0,
+                           "%s has no candidate left" % names[i])
+        cands[i] = m
+
+    for u in units:
+        once = 0
+        for i in u:
+            once |= cands[i]
+        if once != ALL:
+            d = int(mask_digits[ALL & ~once][0])
+            return Invalid('no_place', tuple(names[i] for i in u), d,
+                           "%d has no place in the unit %s-%s" % (d, names[u[0]], names[u[-1]]))
+    return None
+
+
+def validate(grid, topology=SAMURAI):
+    """Return an Invalid saying why grid cannot be solved, or None if it passes the checks."""
+    clues = read(grid, topology)
+    if isinstance(clues, Invalid):
+        return clues
+    return check(clues, topology)